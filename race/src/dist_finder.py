@@ -2,11 +2,12 @@
 
 import rospy
 import math
-from sensor_msgs.msg import LaserScan
 from race.msg import pid_input
 from math import *
 from std_msgs.msg import Int32
 import constants
+import latency_stats
+import scan_utils
 
 # same as desired trajectory
 AC = 1
@@ -24,6 +25,8 @@ CENTER= None
 SIDE = rospy.get_param("/initial_side", -1)
 #SIDE = 1 is right SIDE = -1 is left
 pub = rospy.Publisher('error', pid_input, queue_size=10)
+latency = latency_stats.LatencyReporter('dist_finder')
+scan_latency = latency.stage('scan_to_error')
 
 # Sets SPEED_FACTOR based on new velocity data
 def get_velocity(data):
@@ -31,53 +34,20 @@ def get_velocity(data):
     vel = data.data
     set_speed_factor()
 
-##  Input:  data: Lidar scan data
-##          theta: The angle at which the distance is requried
-##  OUTPUT: distance of scan at angle theta
-def getRange(data,theta):
-# Find the index of the arary that corresponds to angle theta.
-# Return the lidar scan value at that index
-# Do some error checking for NaN and ubsurd values
-## Your code goes here
-
-    theta_0 = data.angle_min
-    theta_delta = data.angle_increment
-
-    idx = int((theta-theta_0)/theta_delta)
-
-    i = 1
-
-    for j in range(len(data.ranges)):
-            # discard any values that are outside valid range
-            if math.isnan(data.ranges[idx]) or data.ranges[idx] > data.range_max or data.ranges[idx] < data.range_min:
-                    if (i % 2 == 0):
-                            idx = idx + -i
-                    else: 
-                            idx = idx + i
-
-                    i = i + 1
-            else: 
-                    return data.ranges[idx]
-
-    return None
-
 def callback(data):
     global SPEED_FACTOR, AC, CENTER, SIDE
 
     print(SIDE)
-    theta = 50;
-    swing = math.radians(theta)
-    a = getRange(data,SIDE * (-pi/2+swing))
-    b = getRange(data,SIDE * (-pi/2))
-
-    alpha = SIDE * atan((a*cos(swing)-b)/(a*sin(swing))) 
+    wall = scan_utils.wall(data, SIDE) # data is a scan or scan_feature_server's features of one
+    if wall is None:
+        return # no valid reading to measure the wall with
+    alpha, AB = wall
 
     if (CENTER == None):
-            CENTER = b*cos(alpha)
+            CENTER = AB
 
     
     ## Your code goes here
-    AB = b*cos(alpha)
     CD = AB + (SIDE * SPEED_FACTOR *(AC*sin(alpha)))
     
     error = CENTER - CD
@@ -87,9 +57,12 @@ def callback(data):
 
     msg = pid_input()
     msg.pid_error = error
+    msg.stamp = data.header.stamp
     print(CENTER,AB) 
     #msg.pid_vel = vel
     pub.publish(msg)
+    if latency_stats.is_set(data.header.stamp): # an unstamped scan would count the time since 1970
+        scan_latency.record(rospy.get_time() - data.header.stamp.to_sec())
     
 def callback2(data):
     global SIDE
@@ -99,6 +72,7 @@ if __name__ == '__main__':
     print("Laser node started")
     rospy.init_node('dist_finder',anonymous = True)
     rospy.Subscriber('side',Int32,callback2)
-    rospy.Subscriber("scan",LaserScan,callback)
+    scan_utils.subscribe_scan_or_features(callback)
     rospy.Subscriber('drive_velocity',Int32,get_velocity) 
+    latency.start()
     rospy.spin()
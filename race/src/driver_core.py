@@ -0,0 +1,232 @@
+# decision logic of the Driver (driver_ai.RacecarAI) as array functions, no ROS needed
+# every function takes a batch of scans, an array of (scans, beams) in the layout of Car.lidar
+
+import collections
+import math
+import numpy
+import gap_finder
+
+STATES = ("auto", "Collision Avoidance") # state names published by the driver, indexed by Decision.state
+WALLS = ("none", "left", "right") # wall the car pulls away from, indexed by Decision.wall
+
+
+def slopes(near, far, pair):
+    # angles of the lines from each near reading to the far reading next to it, pair is the
+    # (cos, sin) of the near beam followed by the (cos, sin) of the far beam
+    cos1, sin1, cos2, sin2 = pair
+    return numpy.arctan2(far*sin2 - near*sin1, far*cos2 - near*cos1)
+
+class BeamTables:
+    '''Trig values and indices of the lidar beams, computed once for a lidar array of n readings
+    so the driver helpers are array expressions instead of per beam math calls'''
+
+    def __init__(self, n):
+        self.n = n
+        # front cone, beams within 45deg of the looked at direction
+        self.beam_angle = math.pi / n
+        self.middle = n//2
+        self.scope = int(math.atan(1) / self.beam_angle) + 1
+        self.front_offsets = numpy.arange(-self.scope, self.scope+1)
+        self.front_sin = numpy.sin(numpy.abs(self.front_offsets) * self.beam_angle).astype(numpy.float32)
+        self.front_index = self.middle + self.front_offsets
+        self.front_pair = (math.cos(self.beam_angle), math.sin(self.beam_angle),
+                           math.cos(2*self.beam_angle), math.sin(2*self.beam_angle))
+        # side walls, seen by the 6 beams next to each end of the array
+        wall_angle = math.pi / (n-1)
+        self.left_pair = (math.cos(wall_angle), math.sin(wall_angle), math.cos(2*wall_angle), math.sin(2*wall_angle))
+        self.right_pair = (math.cos(math.pi - wall_angle), math.sin(math.pi - wall_angle),
+                           math.cos(math.pi - 2*wall_angle), math.sin(math.pi - 2*wall_angle))
+
+    def front(self, angle=0):
+        # indices of the front cone around a relative angle from -pi/2 to pi/2
+        if angle == 0:
+            return self.front_index
+        return int(angle / self.beam_angle + self.middle) + self.front_offsets
+
+#-------------------------------------------------------------------------------------
+
+def front_dist(scans, beams, carLength, angle=0):
+    # closest reading in the 90deg cone around angle that is within half a car length of its centre line
+    index = beams.front(angle)
+    readings = scans[:, index]
+    ahead = readings*beams.front_sin < carLength/2
+    closest = numpy.where(ahead, readings, numpy.inf).min(axis=1)
+    return numpy.where(ahead.any(axis=1), closest, readings[:, beams.scope])
+
+def front_angle(scans, beams, carLength, angle=0):
+    # average slope of the readings front_dist considers
+    index = beams.front(angle)
+    readings = scans[:, index]
+    ahead = readings*beams.front_sin < carLength/2
+    angles = slopes(readings, scans[:, index+1], beams.front_pair)
+    with numpy.errstate(invalid="ignore"):
+        return numpy.where(ahead, angles, 0).sum(axis=1) / ahead.sum(axis=1)
+
+def side_averages(scans, reading_number):
+    # (left, right) average of the readings next to each end of the lidar
+    return scans[:, 0:5*reading_number].mean(axis=1), scans[:, -5*reading_number:].mean(axis=1)
+
+def wall_slopes(scans, beams):
+    # (left, right) average of slopes between left and right lidar readings
+    return (slopes(scans[:, 1:6], scans[:, 2:7], beams.left_pair).mean(axis=1),
+            slopes(scans[:, -2:-7:-1], scans[:, -3:-8:-1], beams.right_pair).mean(axis=1))
+
+def find_gaps(scans, threshold, beams, carWidth, reading_number):
+    # gaps the car fits through in the readings further than threshold, limited to the middle 130deg.
+    # threshold is one value or one per scan, scans with an infinite threshold are skipped
+    threshold = numpy.broadcast_to(numpy.asarray(threshold, dtype=numpy.float64), (len(scans),))
+    rows = numpy.nonzero(numpy.isfinite(threshold))[0]
+    cutoff = reading_number*25
+    row, start, end = gap_finder.find_gaps(scans[rows], threshold[rows, numpy.newaxis], beams.beam_angle,
+                                           carWidth/2, cutoff)
+    return rows[row], start, end
+
+
+class ScanFeatures(object):
+    '''What the driver reads off a batch of scans, each feature computed the first time a decision
+    routine asks for it and kept until update is given a new scan. computed counts the computations
+    of every feature and scans the updates seen, so computed[name] <= scans shows nothing is done twice.
+    car - anything with the Car attributes carLength, carWidth and reading_number'''
+
+    def __init__(self, ranges, beams, car):
+        self.ranges = ranges
+        self.beams = beams
+        self.car = car
+        self.seq = None
+        self.scans = 0
+        self.computed = collections.Counter()
+        self._values = {}
+        # bound once, so looking a feature up allocates nothing once it is computed
+        self._compute = {"front_dist": self._front_dist, "front_angle": self._front_angle,
+                         "side_averages": self._side_averages, "wall_slopes": self._wall_slopes}
+
+    def update(self, seq, ranges=None):
+        # forget the features of the previous scan. seq must change with every scan, ranges is
+        # refilled in place, so a repeated seq keeps the features of the last scan
+        if ranges is not None:
+            self.ranges = ranges
+        if seq != self.seq:
+            self.seq = seq
+            self.scans += 1
+            self._values.clear()
+
+    def _value(self, name):
+        if name not in self._values:
+            self._values[name] = self._compute[name]()
+            self.computed[name] += 1
+        return self._values[name]
+
+    @property
+    def front_dist(self):
+        return self._value("front_dist")
+
+    @property
+    def front_angle(self):
+        return self._value("front_angle")
+
+    @property
+    def side_averages(self):
+        return self._value("side_averages")
+
+    @property
+    def wall_slopes(self):
+        return self._value("wall_slopes")
+
+    def gaps(self, threshold):
+        threshold = numpy.asarray(threshold, dtype=numpy.float64)
+        key = ("gaps", threshold.tobytes())
+        if key not in self._values:
+            self._values[key] = find_gaps(self.ranges, threshold, self.beams, self.car.carWidth, self.car.reading_number)
+            self.computed["gaps"] += 1
+        return self._values[key]
+
+    def _front_dist(self):
+        return front_dist(self.ranges, self.beams, self.car.carLength)
+
+    def _front_angle(self):
+        return front_angle(self.ranges, self.beams, self.car.carLength)
+
+    def _side_averages(self):
+        return side_averages(self.ranges, self.car.reading_number)
+
+    def _wall_slopes(self):
+        return wall_slopes(self.ranges, self.beams)
+
+#-------------------------------------------------------------------------------------
+
+def emergency(front_dist, front_angle, velocity, safetyMode):
+    # safety mode is turned on when the car is too fast for a wall straight ahead or too close to anything
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        fast = velocity**2/front_dist > 0.07 # 0.03 is probably a good approx based readings without motors running
+    perpendicular = (front_angle < 2.0) & (front_angle > 1.2) # range of slopes perpendicular to the car
+    return safetyMode | (fast & perpendicular) | (front_dist < 0.5)
+
+def detect_obstacle(front_dist, motorSpeed, carLength):
+    # Imminent obstacle that needs to be avoided, 4 car lengths away at 10 speed, 8 car lengths at 20 speed
+    lookaheadDistance = numpy.maximum(carLength * 5 * motorSpeed/10, 2.5)
+    return front_dist < lookaheadDistance
+
+
+class Decision:
+
+    def __init__(self, velocity, angle, state, collisionAvoid, obsDist, safetyMode, wall):
+        self.velocity = velocity # requested velocity, before Car.changeMotorSpeed crops or kills it
+        self.angle = angle # new turnAngle, clipped to +/- pi/4
+        self.state = state # index into STATES
+        self.collisionAvoid = collisionAvoid # collision avoidance mode for the next scan
+        self.obsDist = obsDist # distance of the obstacle being avoided
+        self.safetyMode = safetyMode # the motors have to be killed
+        self.wall = wall # index into WALLS, the wall autoProgram pulled away from
+
+
+def decide(features, car, velocity, motorSpeed, turnAngle, collisionAvoid, obsDist, safetyMode,
+           dumb=False, scoring="sum"):
+    '''One driver cycle in auto state for every scan of features, a ScanFeatures.
+    velocity, motorSpeed, turnAngle - the car before the cycle, Car.velocity is used by the
+                                      emergency check and Car.motorSpeed by the obstacle lookahead
+    collisionAvoid, obsDist, safetyMode - the driver before the cycle
+    car - anything with the Car attributes carLength, carWidth, reading_number, slowdown_distance and speed_factor
+    Every argument is a scalar or an array with one value per scan. Returns a Decision of arrays.'''
+    count = len(features.ranges)
+    velocity, motorSpeed, turnAngle, obsDist = [numpy.broadcast_to(numpy.asarray(value, dtype=numpy.float64), (count,))
+                                                for value in (velocity, motorSpeed, turnAngle, obsDist)]
+    collisionAvoid, safetyMode = [numpy.broadcast_to(numpy.asarray(value, dtype=bool), (count,))
+                                  for value in (collisionAvoid, safetyMode)]
+    ahead = features.front_dist
+
+    # check if we are about to collide
+    safety = emergency(ahead, features.front_angle, velocity, safetyMode)
+
+    # autoProgram, speed from the distance ahead and angle from the walls
+    detected = detect_obstacle(ahead, motorSpeed, car.carLength)
+    slowdown = car.slowdown_distance * car.speed_factor
+    auto_velocity = numpy.where(ahead < slowdown, 0.2, # obstacle up ahead but not imminent
+                                numpy.where(ahead < slowdown * 1.4, 0.0,
+                                            (ahead - 2.5) / 7.5 * (car.speed_factor - 0.2) + 0.2))
+    left_slope, right_slope = features.wall_slopes
+    # if in a straight hallway type path, where the angle of left and right wall are kinda the same
+    straight = numpy.abs(left_slope - right_slope) < math.pi/10
+    auto_angle = numpy.where(straight, (left_slope + right_slope - math.pi)/2, 0.0)
+    left, right = features.side_averages
+    wall = numpy.where(left < car.carLength, 1, numpy.where(right < car.carLength, 2, 0))
+    auto_angle = auto_angle + numpy.choose(wall, (0.0, math.pi/12, -math.pi/12))
+
+    # avoidCollision, slowest speed towards the best gap past the obstacle
+    threshold = numpy.where(collisionAvoid, obsDist + 0.1, numpy.inf)
+    heading = (turnAngle + math.pi/2) / features.beams.beam_angle
+    start, end = gap_finder.choose_gaps(features.ranges, features.gaps(threshold), scoring, heading)
+    avoid_angle = numpy.where(start >= 0, gap_finder.gap_angles(start, end, features.beams.beam_angle), turnAngle)
+    # lookahead at the avoiding speed, assuming the motors are not killed
+    avoiding = detect_obstacle(ahead, 100*min(0.2, car.speed_factor)/2.0, car.carLength)
+
+    new_angle = numpy.where(collisionAvoid, avoid_angle, auto_angle)
+    # The intensity of angle change is preportional to the difference in current angle and desired angle
+    angle = numpy.where(numpy.isnan(new_angle), turnAngle, turnAngle + 0.2*(new_angle - turnAngle))
+    next_avoid = numpy.where(collisionAvoid, avoiding, detected | dumb)
+    return Decision(velocity=numpy.where(collisionAvoid, 0.2, auto_velocity),
+                    angle=numpy.clip(angle, -math.pi/4, math.pi/4),
+                    state=next_avoid.astype(numpy.intp),
+                    collisionAvoid=next_avoid,
+                    obsDist=numpy.where(numpy.where(collisionAvoid, avoiding, detected), ahead, obsDist),
+                    safetyMode=safety,
+                    wall=numpy.where(collisionAvoid, 0, wall))
@@ -0,0 +1,93 @@
+# follow the gap: finds the best opening in lidar scans, one scan or a batch of them at a time
+
+import math
+import numpy
+
+SCORING = ("sum", "widest", "deepest", "heading")
+
+
+def inflate(blocked, ranges, beam_angle, half_width):
+    '''Grows every blocked beam by the angle half_width covers at its range, so a gap is only
+    free if the whole car fits through it. blocked and ranges are (scans, beams) arrays.
+    A blocked NaN reading has no range to grow by, it only blocks its own beam.'''
+    scans, beams = blocked.shape
+    row, col = numpy.nonzero(blocked)
+    if half_width <= 0 or len(col) == 0:
+        return blocked
+    dist = ranges[row, col]
+    dist = numpy.where(numpy.isnan(dist), numpy.inf, numpy.maximum(dist, 1e-6))
+    grow = numpy.ceil(numpy.arcsin(numpy.minimum(half_width / dist, 1.0)) / beam_angle).astype(numpy.intp)
+    # count the obstacles covering every beam: +1 where a grown obstacle starts, -1 after it ends
+    edges = numpy.zeros((scans, beams + 1), dtype=numpy.intp)
+    numpy.add.at(edges, (row, numpy.maximum(col - grow, 0)), 1)
+    numpy.add.at(edges, (row, numpy.minimum(col + grow + 1, beams)), -1)
+    return numpy.cumsum(edges[:, :beams], axis=1) > 0
+
+
+def find_gaps(ranges, threshold, beam_angle, half_width=0.0, cutoff=0):
+    '''Returns (row, start, end) arrays of every run of free beams, end is exclusive.
+    A beam is free when its range is over threshold and it is not covered by an inflated obstacle.
+    cutoff beams at both ends of each scan are never part of a gap.'''
+    ranges = numpy.atleast_2d(ranges)
+    blocked = ~(ranges > threshold) # NaN readings are blocked
+    free = ~inflate(blocked, ranges, beam_angle, half_width)
+    free[:, :cutoff] = False
+    free[:, free.shape[1]-cutoff:] = False
+    # pad with a blocked beam on both sides so every run has a rising and a falling edge
+    edges = numpy.diff(numpy.pad(free, ((0, 0), (1, 1)), "constant").astype(numpy.int8), axis=1)
+    row, start = numpy.nonzero(edges == 1)
+    end = numpy.nonzero(edges == -1)[1]
+    return row, start, end
+
+
+def best_gaps(ranges, threshold, beam_angle, half_width=0.0, cutoff=0, scoring="sum", heading=None):
+    '''Picks the best gap of every scan in ranges, an array of (scans, beams) or (beams,).
+    The arguments are those of find_gaps and choose_gaps.
+    Returns the (start, end) beam arrays of the chosen gaps, -1 for scans without any gap.'''
+    return choose_gaps(ranges, find_gaps(ranges, threshold, beam_angle, half_width, cutoff), scoring, heading)
+
+
+def choose_gaps(ranges, gaps, scoring="sum", heading=None):
+    '''Picks the best of the gaps find_gaps returned for every scan in ranges.
+    scoring - "sum" of the ranges in the gap, "widest" gap, "deepest" reading,
+              or "heading", the gap whose middle is closest to the heading index
+    heading - beam index the car is pointing at, one for every scan, only used by "heading"
+    Returns the (start, end) beam arrays of the chosen gaps, -1 for scans without any gap.
+    Ties go to the gap with the lowest start.'''
+    if scoring not in SCORING:
+        raise ValueError("scoring must be one of %s, not %r" % (", ".join(SCORING), scoring))
+    ranges = numpy.atleast_2d(numpy.asarray(ranges, dtype=numpy.float64))
+    scans = len(ranges)
+    row, start, end = gaps
+
+    if scoring == "sum":
+        total = numpy.zeros((scans, ranges.shape[1] + 1))
+        numpy.cumsum(numpy.nan_to_num(ranges), axis=1, out=total[:, 1:])
+        score = total[row, end] - total[row, start]
+    elif scoring == "widest":
+        score = end - start
+    elif scoring == "deepest":
+        # reduceat over (start, end) pairs of the flattened scans, every second result is a gap
+        flat = numpy.pad(numpy.nan_to_num(ranges), ((0, 0), (0, 1)), "constant").ravel()
+        offset = row * (ranges.shape[1] + 1)
+        bounds = numpy.column_stack([offset + start, offset + end]).ravel()
+        score = numpy.maximum.reduceat(flat, bounds)[::2] if len(bounds) else numpy.zeros(0)
+    else:
+        heading = numpy.broadcast_to(numpy.asarray(heading, dtype=numpy.float64), (scans,))
+        score = -numpy.abs((start + end - 1) / 2.0 - heading[row])
+
+    best_start = numpy.full(scans, -1, dtype=numpy.intp)
+    best_end = numpy.full(scans, -1, dtype=numpy.intp)
+    if len(row):
+        # sorted by scan, then score, then latest start first, so the last gap of a scan is its best
+        order = numpy.lexsort((-start, score, row))
+        last = order[numpy.r_[row[order][1:] != row[order][:-1], True]]
+        best_start[row[last]] = start[last]
+        best_end[row[last]] = end[last]
+    return best_start, best_end
+
+
+def gap_angles(start, end, beam_angle):
+    # angle to the middle of each gap, 0 is straight ahead and beam 0 is -pi/2. NaN where there is no gap
+    middle = start + (end - start)//2
+    return numpy.where(start >= 0, middle * beam_angle - math.pi/2, numpy.nan)
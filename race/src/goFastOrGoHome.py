@@ -4,7 +4,6 @@ import constants
 import rospy
 from std_msgs.msg import Bool
 from race.msg import drive_param
-from sensor_msgs.msg import LaserScan
 from std_msgs.msg import Int32
 import time
 '''Need rospy and message types for eStop (bool), drive_parameters (drive_param), scan (LaserScan)'''
@@ -12,8 +11,8 @@ import time
 from math import radians, degrees, pi #for conversions
 from math import * #for conversions
 
-from numpy import isnan
 import numpy 
+import scan_utils
 
 
 side_pub = rospy.Publisher('side', Int32, queue_size=1)
@@ -112,84 +111,25 @@ def detectTurn(laser_data):
 
 
 
-'''
-Input:  data: Lidar scan data
-        theta_start: Min angle data to give (RADIANS)
-        theta_end: Max angle data to give (RADIANS)
-OUTPUT: distance of scan at angle theta
-'''
-def getSomeScans(data,theta_start,theta_end):
-    if (theta_start > theta_end):
-        return None
-    theta_0 = data.angle_min
-    theta_delta = data.angle_increment
-    
-    start = int((theta_start-theta_0)/theta_delta)
-    end = int((theta_end-theta_0)/theta_delta)
-
-    subset = data.ranges[start:end]
-    MIN = data.range_min
-    return [x for x in subset if (~isnan(x) and x>MIN)] #discards garbage
-
-##  Input:  data: Lidar scan data
-##          theta: The angle at which the distance is requried
-##  OUTPUT: distance of scan at angle theta
-def getRange(data,theta):
-# Find the index of the arary that corresponds to angle theta.
-# Return the lidar scan value at that index
-# Do some error checking for NaN and ubsurd values
-## Your code goes here
-
-    theta_0 = data.angle_min
-    theta_delta = data.angle_increment
-
-    idx = int((theta-theta_0)/theta_delta)
-
-    i = 1
-
-    for j in range(len(data.ranges)):
-            # discard any values that are outside valid range
-            if isnan(data.ranges[idx]) or data.ranges[idx] > data.range_max or data.ranges[idx] < data.range_min:
-                    if (i % 2 == 0):
-                            idx = idx + -i
-                    else: 
-                            idx = idx + i
-
-                    i = i + 1
-            else: 
-                    return data.ranges[idx]
-
-    return None
-
-
 '''Check points around headed angle, and also right in front'''
 def detect_collision(laser_data):
     global velocity,SIDE,FRONT_BUMPER_THRESHOLD
 
 
 
-    theta = 50
-    swing = radians(theta)
-    a = getRange(laser_data,SIDE * (-pi/2+swing))
-    b = getRange(laser_data,SIDE * (-pi/2))
-
-    angle = abs(atan((a*cos(swing)-b)/(a*sin(swing))))
+    # laser_data is a scan or scan_feature_server's features of one
+    wall = scan_utils.wall(laser_data, SIDE)
+    if wall is None:
+        return False # no valid reading in the scan, so none in front either
+    angle = abs(wall[0])
 
     if (angle > asin(WIDTH/2/FRONT_BUMPER_THRESHOLD)):
         threshold = WIDTH/2/sin(angle)
     else:
         threshold = FRONT_BUMPER_THRESHOLD
 
-    left_theta = - asin(0.15/threshold)
-    right_theta = - left_theta
-
-    #left_theta = -pi/64
-    #right_theta = pi/64
-
     #Check scans in immediate front
-    distances = getSomeScans(laser_data,left_theta,right_theta)
-    within_thresh = [x < threshold for x in distances]
-    if numpy.mean(within_thresh) > .35:
+    if scan_utils.front_fraction(laser_data, threshold) > .35:
         return True
     '''if min(distances)<threshold:
                     return True
@@ -233,7 +173,7 @@ if __name__=='__main__':
     setSpeed(VEL)
 
     drive_sub = rospy.Subscriber('drive_parameters', drive_param, save_drive)
-    laser_sub = rospy.Subscriber('scan', LaserScan, detectTurn)
+    laser_sub = scan_utils.subscribe_scan_or_features(detectTurn)
     rospy.Subscriber('side',Int32,side_callback)
     #turn_sub = rospy.Subscriber('is_turning', Bool, set_threshold)
     rospy.spin()
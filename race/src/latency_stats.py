@@ -0,0 +1,114 @@
+# scan to command latency histograms, reported on /diagnostics
+
+import bisect
+import math
+import threading
+import numpy
+import rospy
+from diagnostic_msgs.msg import DiagnosticArray
+from diagnostic_msgs.msg import DiagnosticStatus
+from diagnostic_msgs.msg import KeyValue
+
+PERCENTILES = (50, 95, 99)
+
+
+def seconds(stamp):
+    # a header stamp in seconds, stamps of offline replays are already floats
+    if hasattr(stamp, "to_sec"):
+        return stamp.to_sec()
+    return float(stamp)
+
+def is_set(stamp):
+    # messages from nodes that do not stamp them carry a zero time
+    return seconds(stamp) > 0
+
+
+class LatencyHistogram(object):
+    '''Latencies counted in fixed width bins from 0 to max_latency seconds, plus one bin for
+    everything slower. Recording is a bisection of the bin edges and an increment, so it can
+    stay on during races. Percentiles are the upper edge of the bin they fall in. The node records
+    from its callback thread while the reporter reads and resets from the timer thread, so every
+    method holds the histogram's lock.'''
+
+    def __init__(self, max_latency=0.5, bins=1000):
+        bin_width = max_latency / float(bins)
+        self.edges = [bin_width * (index + 1) for index in range(bins)] # upper edge of every bin
+        self.counts = [0] * (bins + 1)
+        self.count = 0
+        self.maximum = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        # clocks of different machines can be slightly apart, negative latencies go in the first bin
+        with self.lock:
+            self.counts[bisect.bisect_left(self.edges, latency)] += 1
+            self.count += 1
+            if latency > self.maximum:
+                self.maximum = latency
+
+    def percentile(self, percent):
+        with self.lock:
+            return self._percentile(percent)
+
+    def _percentile(self, percent):
+        if self.count == 0:
+            return float("nan")
+        rank = max(int(math.ceil(self.count * percent / 100.0)), 1)
+        index = int(numpy.searchsorted(numpy.cumsum(self.counts), rank))
+        if index == len(self.edges):
+            return self.maximum
+        return min(self.edges[index], self.maximum)
+
+    def reset(self):
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.counts[:] = [0] * len(self.counts)
+        self.count = 0
+        self.maximum = 0.0
+
+    def take(self, percents=PERCENTILES):
+        # (count, maximum, percentile of every one of percents) and a reset, in one go so no
+        # latency recorded in between is lost
+        with self.lock:
+            summary = self.count, self.maximum, [self._percentile(percent) for percent in percents]
+            self._reset()
+        return summary
+
+
+class LatencyReporter(object):
+    '''Latency histograms of the stages of one node, published on /diagnostics every period
+    seconds as p50/p95/p99 in milliseconds. Histograms are reset after every report, so each
+    report covers the last period.'''
+
+    def __init__(self, node, period=1.0, publisher=rospy.Publisher):
+        self.node = node
+        self.period = period
+        self.stages = {}
+        self.pub = publisher('/diagnostics', DiagnosticArray, queue_size=1)
+        self.timer = None
+
+    def stage(self, name, max_latency=0.5):
+        # the histogram of a stage, created the first time it is asked for
+        if name not in self.stages:
+            self.stages[name] = LatencyHistogram(max_latency)
+        return self.stages[name]
+
+    def start(self):
+        self.timer = rospy.Timer(rospy.Duration(self.period), self.publish)
+
+    def publish(self, event=None):
+        msg = DiagnosticArray()
+        msg.header.stamp = rospy.Time.now()
+        for name in sorted(self.stages):
+            count, maximum, percentiles = self.stages[name].take()
+            status = DiagnosticStatus(level=DiagnosticStatus.OK, name="%s: %s latency" % (self.node, name),
+                                      hardware_id=self.node)
+            status.message = "%d samples" % count
+            status.values = [KeyValue("p%d_ms" % percent, "%.2f" % (1000 * value))
+                             for percent, value in zip(PERCENTILES, percentiles)]
+            status.values.append(KeyValue("max_ms", "%.2f" % (1000 * maximum)))
+            status.values.append(KeyValue("count", str(count)))
+            msg.status.append(status)
+        self.pub.publish(msg)
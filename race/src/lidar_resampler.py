@@ -0,0 +1,64 @@
+# resamples LaserScan ranges into the driver's fixed front facing lidar array
+
+import math
+import numpy
+
+
+class ScanResampler(object):
+    '''Maps the beams of a LaserScan onto an array of `bins` readings spread evenly from
+    +90 degrees (left, index 0) to -90 degrees (right, last index), the layout Car.lidar uses.
+
+    The index map only depends on the scan geometry (angle_min, angle_increment and the
+    number of ranges), so it is built once and rebuilt only when the geometry changes.
+    Each fill is then a single NumPy gather.
+
+    pooling - "nearest" copies the beam closest to each bin's angle,
+              "min" keeps the shortest reading among all beams within half a bin of the bin's
+              angle, so a thin obstacle between two bin angles is never dropped
+    '''
+
+    def __init__(self, bins, pooling="nearest"):
+        if pooling not in ("nearest", "min"):
+            raise ValueError("pooling must be 'nearest' or 'min', not %r" % (pooling,))
+        self.bins = bins
+        self.pooling = pooling
+        self.bin_angle = math.pi / (bins - 1) # angle between neighbouring bins
+        self.geometry = None
+        self.rebuilds = 0 # number of times the index map was built
+        self._nearest = None
+        self._pool = None
+
+    def _build(self, angle_min, angle_increment, count):
+        # bin k looks at angle pi/2 - k*bin_angle, measured in beams from angle_min
+        angles = math.pi/2 - numpy.arange(self.bins) * self.bin_angle
+        position = (angles - angle_min) / angle_increment
+        self._nearest = numpy.clip(numpy.round(position), 0, count - 1).astype(numpy.intp)
+
+        # bin k owns the beams with angles in (angle_k - bin_angle/2, angle_k + bin_angle/2]
+        half = self.bin_angle / 2 / angle_increment
+        high = numpy.floor(position + half + 1e-6).astype(numpy.intp)
+        low = numpy.floor(position - half + 1e-6).astype(numpy.intp) + 1
+        # bins narrower than a beam still get the beam at their angle
+        low = numpy.minimum(low, self._nearest)
+        high = numpy.maximum(high, self._nearest)
+        high = numpy.clip(high, 0, count - 1)
+        low = numpy.clip(low, 0, count - 1)
+        width = int((high - low).max()) + 1
+        # pad short windows by repeating their last beam, which does not change the minimum
+        self._pool = numpy.minimum(low[:, numpy.newaxis] + numpy.arange(width), high[:, numpy.newaxis])
+
+        self.geometry = (angle_min, angle_increment, count)
+        self.rebuilds += 1
+
+    def fill(self, scan, out):
+        '''Writes the resampled ranges of a LaserScan into out, an array of length bins'''
+        ranges = numpy.asarray(scan.ranges, dtype=out.dtype)
+        geometry = (scan.angle_min, scan.angle_increment, len(ranges))
+        if geometry != self.geometry:
+            self._build(*geometry)
+        if self.pooling == "nearest":
+            numpy.take(ranges, self._nearest, out=out)
+        else:
+            # fmin ignores NaN beams unless every beam in the bin is NaN
+            numpy.fmin.reduce(ranges[self._pool], axis=1, out=out)
+        return out
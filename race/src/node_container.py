@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# runs several of the python race nodes in one process, messages between them are passed by reference
+
+import collections
+import os
+import runpy
+import sys
+import threading
+import types
+import rospy
+import rospy.numpy_msg
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+INTRA_QUEUE_SIZE = 10 # messages kept for a component subscribed without a queue_size
+
+
+class IntraSubscription(object):
+    '''An in-process subscriber. Messages are queued and handed to the callback by a thread of its
+    own, so like a rospy.Subscriber the callback never runs concurrently with itself and a slow
+    callback does not hold up the publisher. Only the newest queue_size messages are kept,
+    INTRA_QUEUE_SIZE when it is None.'''
+
+    def __init__(self, bus, topic, callback, callback_args=None, queue_size=None, component=None):
+        self.bus = bus
+        self.topic = topic
+        self.callback = callback
+        self.callback_args = callback_args
+        self.component = component
+        self.queue = collections.deque(maxlen=queue_size or INTRA_QUEUE_SIZE)
+        self.ready = threading.Condition()
+        self.closed = False
+        thread = threading.Thread(target=self._deliver, name="intra %s" % topic)
+        thread.daemon = True
+        thread.start()
+
+    def put(self, msg):
+        with self.ready:
+            self.queue.append(msg)
+            self.ready.notify()
+
+    def _deliver(self):
+        _local.component = self.component
+        while True:
+            with self.ready:
+                while not self.queue and not self.closed:
+                    self.ready.wait()
+                if self.closed:
+                    return
+                msg = self.queue.popleft()
+            try:
+                if self.callback_args is None:
+                    self.callback(msg)
+                else:
+                    self.callback(msg, self.callback_args)
+            except Exception as error:
+                rospy.logerr("%s callback of %s failed: %s" % (self.topic, self.component, error))
+
+    def unregister(self):
+        self.bus.unsubscribe(self)
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+
+    def get_num_connections(self):
+        return len(self.bus.subscriptions.get(self.topic, ()))
+
+
+class IntraBus(object):
+    '''Topics delivered inside the process. Publishing one of them hands the message object itself to
+    every in-process subscriber, nothing is serialized. Neither side may change a message once it is
+    published, so nodes reusing their messages (driver_ai) should not publish on these topics.
+    Subscribers inside the container only get the messages published inside it.'''
+
+    def __init__(self, topics):
+        self.topics = set(rospy.resolve_name(topic) for topic in topics)
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.setdefault(subscription.topic, []).append(subscription)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions[subscription.topic].remove(subscription)
+
+    def publish(self, topic, msg):
+        for subscription in tuple(self.subscriptions.get(topic, ())):
+            subscription.put(msg)
+
+
+class ContainerPublisher(object):
+    '''rospy.Publisher that also delivers on the IntraBus. Nodes outside the container still get
+    the messages over TCPROS, rospy only serializes them when someone is connected.'''
+
+    def __init__(self, bus, name, data_class, *args, **kwargs):
+        self.real = rospy.Publisher(name, data_class, *args, **kwargs)
+        self.topic = self.real.resolved_name
+        self.bus = bus if self.topic in bus.topics else None
+
+    def publish(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], self.real.data_class):
+            msg = args[0]
+        else:
+            msg = self.real.data_class(*args, **kwargs)
+        if self.bus is not None:
+            self.bus.publish(self.topic, msg)
+        self.real.publish(msg)
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+_local = threading.local() # component of the thread, for private parameters
+
+
+class ContainerRospy(types.ModuleType):
+    '''Stands in for the rospy module while the components run. Everything is rospy's except
+    init_node, which only names the component, get_param, which looks ~private parameters up
+    under the container's own private namespace, ~<component>/<name>, and Publisher and Subscriber, which use the IntraBus.'''
+
+    def __init__(self, bus, name):
+        types.ModuleType.__init__(self, "rospy")
+        self.bus = bus
+        self.container = name
+
+    def __getattr__(self, name):
+        return getattr(rospy, name)
+
+    def init_node(self, name, *args, **kwargs):
+        rospy.loginfo("%s: component %s started as %s" % (self.container, _component(), name))
+
+    def get_param(self, name, *default):
+        if name.startswith("~"):
+            name = "%s/%s/%s" % (rospy.get_name(), _component(), name[1:])
+        return rospy.get_param(name, *default)
+
+    def Publisher(self, name, data_class, *args, **kwargs):
+        return ContainerPublisher(self.bus, name, data_class, *args, **kwargs)
+
+    def Subscriber(self, name, data_class, callback=None, callback_args=None, queue_size=None, *args, **kwargs):
+        topic = rospy.resolve_name(name)
+        if topic not in self.bus.topics:
+            return rospy.Subscriber(name, data_class, callback, callback_args, queue_size, *args, **kwargs)
+        subscription = IntraSubscription(self.bus, topic, callback, callback_args, queue_size, _component())
+        self.bus.subscribe(subscription)
+        return subscription
+
+
+def _component():
+    return getattr(_local, "component", None) or rospy.get_name().lstrip("/")
+
+
+def run_component(path, name):
+    # runs a node script as __main__ in the current thread, until its rospy.spin returns
+    _local.component = name
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except Exception as error:
+        rospy.logerr("component %s (%s) stopped: %s" % (name, path, error))
+
+
+if __name__ == '__main__':
+    rospy.init_node('race_container')
+    # node scripts next to this one or full paths, each runs under its file name without .py
+    components = rospy.get_param('~components', [])
+    # topics passed by reference between the components, only list topics no node outside publishes
+    bus = IntraBus(rospy.get_param('~intra_topics', []))
+
+    sys.modules["rospy"] = ContainerRospy(bus, rospy.get_name())
+    for script in components:
+        path = script if os.path.isabs(script) else os.path.join(SRC, script)
+        name = os.path.splitext(os.path.basename(path))[0]
+        thread = threading.Thread(target=run_component, args=(path, name), name=name)
+        thread.daemon = True
+        thread.start()
+    rospy.spin()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# time to deserialize recorded LaserScans the way plain rospy subscribers do (ranges as a tuple of floats)
+# and the way scan_utils.subscribe_scan does (ranges as a numpy view over the message buffer)
+
+import argparse
+import io
+import time
+import numpy
+import rospy
+from rospy.numpy_msg import numpy_msg
+from sensor_msgs.msg import LaserScan
+
+import scan_replay
+
+
+def serialized_scans(path, topic="/scan"):
+    # the serialized messages of a bag, the other recordings scan_replay reads are serialized here
+    if path.endswith(".bag"):
+        import rosbag
+        with rosbag.Bag(path) as bag:
+            return [raw[1] for _, raw, _ in bag.read_messages(topics=[topic], raw=True)]
+    buffers = []
+    for scan in scan_replay.load_scans(path, topic):
+        msg = LaserScan()
+        msg.header.seq = scan.header.seq
+        msg.header.stamp = rospy.Time.from_sec(scan.header.stamp)
+        msg.angle_min = scan.angle_min
+        msg.angle_increment = scan.angle_increment
+        msg.angle_max = scan.angle_min + scan.angle_increment * (len(scan.ranges) - 1)
+        msg.ranges = [float(value) for value in scan.ranges]
+        buff = io.BytesIO()
+        msg.serialize(buff)
+        buffers.append(buff.getvalue())
+    return buffers
+
+
+def deserialize_time(msg_class, buffers, repeat=5, to_array=False):
+    '''Best of repeat passes over buffers, in seconds per message.
+    to_array - also make a float32 array of the ranges, what the driver and scan_utils do with every scan'''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.time()
+        for buff in buffers:
+            msg = msg_class().deserialize(buff)
+            if to_array:
+                numpy.asarray(msg.ranges, dtype=numpy.float32)
+        best = min(best, time.time() - start)
+    return best / len(buffers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare LaserScan deserialization into tuples and into numpy arrays")
+    parser.add_argument("scans", help=".bag, .npz or a `rostopic echo -p` CSV export of the scan topic")
+    parser.add_argument("--topic", default="/scan", help="scan topic in a bag")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the scans, the fastest is reported")
+    args = parser.parse_args()
+
+    buffers = serialized_scans(args.scans, args.topic)
+    print("%d scans, %d bytes each on average" % (len(buffers), sum(len(buff) for buff in buffers) // max(len(buffers), 1)))
+    for to_array in (False, True):
+        before = deserialize_time(LaserScan, buffers, args.repeat, to_array)
+        after = deserialize_time(numpy_msg(LaserScan), buffers, args.repeat, to_array)
+        print("%-26s LaserScan %8.1f us  numpy_msg(LaserScan) %8.1f us  %5.1fx"
+              % ("deserialize + ranges array" if to_array else "deserialize", 1e6*before, 1e6*after, before/after))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# computes the scan features of the wall following nodes once per scan and publishes them on scan_features,
+# so dist_finder, obstacle_detector and goFastOrGoHome do not each decode and filter every scan
+
+import rospy
+import numpy
+from race.msg import scan_features
+
+import constants
+import scan_utils
+
+# every FRONT_BUMPER_THRESHOLD of obstacle_detector and goFastOrGoHome: their stopping distances, the
+# initial 3 m and the 0.5 and 1.5 m of turning_callback
+STOPPING_DISTANCES = sorted(set([speed["STOPPING_DISTANCE"] for pid in (constants.PID_CONST, constants.PID_CONST_FAST)
+                                 for speed in pid.values()] + [0.5, 1.5, 3.0]))
+
+
+class ScanFeatureServer(object):
+    '''Publishes a new scan_features message for every scan, as node_container hands the published
+    message itself to the nodes running next to the server.
+    front_fraction is computed for every threshold from ~front_threshold_min to ~front_threshold_max
+    in steps of ~front_threshold_step and at each of STOPPING_DISTANCES, consumers interpolate between
+    them. The defaults cover every threshold the nodes ask for, from WIDTH/2 of goFastOrGoHome up to
+    the longest stopping distance. The stopping distances are exact, the thresholds the nodes derive
+    from the wall angle fall between grid points: their fraction is off by up to the change between
+    the neighbouring thresholds, which can flip the nodes' 0.35 decision when those straddle it.
+    A smaller ~front_threshold_step narrows that.'''
+
+    def __init__(self, publisher=rospy.Publisher, subscribe=True):
+        self.pub = publisher('scan_features', scan_features, queue_size=1)
+        low = rospy.get_param('~front_threshold_min', 0.25)
+        high = rospy.get_param('~front_threshold_max', max(STOPPING_DISTANCES))
+        grid = numpy.arange(low, high + 1e-6, rospy.get_param('~front_threshold_step', 0.25))
+        stops = [distance for distance in STOPPING_DISTANCES if low <= distance <= high]
+        self.thresholds = numpy.unique(numpy.round(numpy.concatenate([grid, stops]), 6))
+        self.front_thresholds = self.thresholds.tolist()
+        if subscribe:
+            scan_utils.subscribe_scan(self.callback, queue_size=1)
+
+    def callback(self, data):
+        msg = scan_features()
+        msg.header = data.header
+        msg.front_thresholds = self.front_thresholds
+        left = scan_utils.wall(data, -1) or (float("nan"), float("nan"))
+        right = scan_utils.wall(data, 1) or (float("nan"), float("nan"))
+        msg.left_alpha, msg.left_dist = left
+        msg.right_alpha, msg.right_dist = right
+        msg.corridor_width = msg.left_dist + msg.right_dist
+        msg.front_fraction = [scan_utils.front_fraction(data, threshold) for threshold in self.thresholds]
+        msg.nearest_dist, msg.nearest_bearing = scan_utils.nearest_reading(data)
+        self.pub.publish(msg)
+
+
+if __name__ == '__main__':
+    rospy.init_node('scan_feature_server', anonymous=True)
+    ScanFeatureServer()
+    rospy.spin()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# replays recorded LaserScans through driver_ai.RacecarAI as fast as possible, no ROS master needed
+
+import argparse
+import csv
+import os
+import sys
+import time
+import numpy
+
+try:
+    import importlib.util as importlib_util
+except ImportError: # python 2
+    importlib_util = None
+
+DECISION_DTYPE = numpy.dtype([("seq", numpy.int64), ("stamp", numpy.float64),
+                              ("velocity", numpy.float32), ("angle", numpy.float32), # drive_parameters
+                              ("alert", "S32"), ("state", "S32")])
+COMPARED = ("velocity", "angle", "alert", "state")
+
+
+class Header(object):
+
+    def __init__(self, seq, stamp):
+        self.seq = seq
+        self.stamp = stamp # seconds
+
+
+class RecordedScan(object):
+    '''The parts of a sensor_msgs/LaserScan the driver reads'''
+
+    def __init__(self, seq, stamp, angle_min, angle_increment, ranges):
+        self.header = Header(seq, stamp)
+        self.angle_min = angle_min
+        self.angle_increment = angle_increment
+        self.ranges = ranges
+
+
+def load_npz(path):
+    # ranges (scans, beams), angle_min and angle_increment, optional stamps and seq
+    data = numpy.load(path)
+    ranges = data["ranges"]
+    stamps = data["stamps"] if "stamps" in data else numpy.arange(len(ranges)) / 40.0
+    seqs = data["seq"] if "seq" in data else numpy.arange(len(ranges))
+    angle_min = float(data["angle_min"])
+    angle_increment = float(data["angle_increment"])
+    return [RecordedScan(int(seq), float(stamp), angle_min, angle_increment, row)
+            for seq, stamp, row in zip(seqs, stamps, ranges)]
+
+def load_csv(path):
+    # export of `rostopic echo -p /scan`, stamps are in nanoseconds
+    scans = []
+    with open(path) as export:
+        rows = csv.reader(export)
+        header = next(rows)
+        column = dict((name, index) for index, name in enumerate(header))
+        ranges = [index for index, name in enumerate(header) if name.startswith("field.ranges")]
+        for row in rows:
+            scans.append(RecordedScan(int(row[column["field.header.seq"]]),
+                                      int(row[column["field.header.stamp"]]) * 1e-9,
+                                      float(row[column["field.angle_min"]]),
+                                      float(row[column["field.angle_increment"]]),
+                                      numpy.array([float(row[index]) for index in ranges], dtype=numpy.float32)))
+    return scans
+
+def load_bag(path, topic="/scan"):
+    import rosbag
+    scans = []
+    with rosbag.Bag(path) as bag:
+        for _, msg, _ in bag.read_messages(topics=[topic]):
+            scans.append(RecordedScan(msg.header.seq, msg.header.stamp.to_sec(), msg.angle_min,
+                                      msg.angle_increment, msg.ranges))
+    return scans
+
+def load_scans(path, topic="/scan"):
+    if path.endswith(".npz"):
+        return load_npz(path)
+    if path.endswith(".bag"):
+        return load_bag(path, topic)
+    return load_csv(path)
+
+
+def _load_source(name, path):
+    # runs the file at path as module name, registered in sys.modules like an import would
+    if importlib_util is None:
+        import imp
+        return imp.load_source(name, path)
+    spec = importlib_util.spec_from_file_location(name, path)
+    module = importlib_util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def load_driver(path, name=None):
+    '''Loads a driver_ai.py as its own module, together with the modules next to it, so two
+    versions of the driver (and of driver_core, gap_finder...) can be compared in one process.'''
+    directory = os.path.dirname(os.path.abspath(path))
+    local = [entry[:-3] for entry in os.listdir(directory) if entry.endswith(".py")]
+    saved = dict((module, sys.modules.pop(module)) for module in local if module in sys.modules)
+    sys.path.insert(0, directory)
+    try:
+        return _load_source(name or "replayed_driver", path)
+    finally:
+        sys.path.remove(directory)
+        for module in local:
+            sys.modules.pop(module, None)
+        sys.modules.update(saved)
+
+
+class Outputs(object):
+    '''Stand-in for rospy.Publisher, keeps the last message published on every topic'''
+
+    def __init__(self):
+        self.last = {}
+
+    def publisher(self, topic, msg_type, queue_size=None):
+        outputs = self
+
+        class Publisher(object):
+            def publish(self, msg):
+                outputs.last[topic] = msg
+        return Publisher()
+
+    def data(self, topic):
+        # the last value of a std_msgs topic, the driver reuses its message objects
+        msg = self.last[topic]
+        return str(getattr(msg, "data", msg))
+
+
+class Clock(object):
+    # the driver's time, set to the stamp of the scan being replayed
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ReplayResult(object):
+
+    def __init__(self, decisions, wall_time):
+        self.decisions = decisions # array of DECISION_DTYPE, one for every scan
+        self.wall_time = wall_time # real seconds spent in the driver
+
+    @property
+    def decisions_per_sec(self):
+        if self.wall_time <= 0:
+            return float("inf")
+        return len(self.decisions) / self.wall_time
+
+    def __repr__(self):
+        return "ReplayResult(%d scans, %.1f decisions/sec)" % (len(self.decisions), self.decisions_per_sec)
+
+
+def replay(driver, scans, params=None, dumb=False):
+    '''Runs every scan through a fresh RacecarAI of the driver module and records what it published'''
+    clock = Clock()
+    clock.now = scans[0].header.stamp if scans else 0.0
+    outputs = Outputs()
+    ai = driver.RacecarAI(driver.Car(clock=clock), False, dumb, publisher=outputs.publisher, subscribe=False,
+                          params=params or {})
+    decisions = numpy.zeros(len(scans), dtype=DECISION_DTYPE)
+    wall_time = 0.0
+    for decision, scan in zip(decisions, scans):
+        clock.now = scan.header.stamp
+        start = time.time()
+        ai.process_scan(scan)
+        wall_time += time.time() - start
+        drive = outputs.last["drive_parameters"]
+        decision["seq"] = scan.header.seq
+        decision["stamp"] = scan.header.stamp
+        decision["velocity"] = drive.velocity
+        decision["angle"] = drive.angle
+        decision["alert"] = outputs.data("alert").encode("ascii")
+        decision["state"] = outputs.data("state").encode("ascii")
+    return ReplayResult(decisions, wall_time)
+
+
+def diff(first, second, tolerance=1e-4):
+    '''Indices of the scans where two replays of the same scans published different commands'''
+    changed = numpy.zeros(len(first), dtype=bool)
+    for field in COMPARED:
+        if first.dtype[field].kind == "f":
+            changed |= numpy.abs(first[field] - second[field]) > tolerance
+        else:
+            changed |= first[field] != second[field]
+    return numpy.nonzero(changed)[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recorded scans through the driver")
+    parser.add_argument("scans", help=".npz, .bag or a `rostopic echo -p` CSV export of the scan topic")
+    parser.add_argument("--driver", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "driver_ai.py"))
+    parser.add_argument("--diff", default=None, metavar="DRIVER", help="another driver_ai.py to compare with")
+    parser.add_argument("--topic", default="/scan", help="scan topic in a bag")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE", help="driver private parameter")
+    parser.add_argument("--out", default=None, help="write the decisions to this .npy file")
+    parser.add_argument("--show", type=int, default=20, help="number of differing scans to print")
+    args = parser.parse_args()
+
+    params = dict(param.split("=", 1) for param in args.param)
+    for name, value in params.items():
+        try:
+            params[name] = float(value)
+        except ValueError:
+            pass
+    scans = load_scans(args.scans, args.topic)
+    result = replay(load_driver(args.driver, "driver_a"), scans, params)
+    print("%s: %r" % (args.driver, result))
+    if args.out is not None:
+        numpy.save(args.out, result.decisions)
+
+    if args.diff is not None:
+        other = replay(load_driver(args.diff, "driver_b"), scans, params)
+        print("%s: %r" % (args.diff, other))
+        changed = diff(result.decisions, other.decisions)
+        print("%d of %d scans differ" % (len(changed), len(scans)))
+        for index in changed[:args.show]:
+            a, b = result.decisions[index], other.decisions[index]
+            print("scan %d seq %d at %.3f: %s" % (index, a["seq"], a["stamp"],
+                  ", ".join("%s %s -> %s" % (field, a[field], b[field]) for field in COMPARED if a[field] != b[field])))
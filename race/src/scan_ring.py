@@ -0,0 +1,246 @@
+# ring of the latest LaserScans in shared memory, written by scan_ring_bridge and read by nodes in other processes
+# without deserializing a message per subscriber
+
+import mmap
+import os
+import threading
+import time
+import numpy
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: # python 2
+    shared_memory = None
+
+DEFAULT_NAME = "race_scan"
+MAGIC = 0x52414345 # "RACE"
+HEADER_DTYPE = numpy.dtype([("magic", numpy.uint32), ("slots", numpy.uint32), ("beams", numpy.uint32),
+                            ("pad", numpy.uint32), ("written", numpy.uint64)])
+HEADER_SIZE = 64
+
+
+def slot_dtype(beams):
+    # one scan, padded to a multiple of 64 bytes so slots do not share cache lines
+    fields = numpy.dtype([("seq", numpy.uint64), # seqlock, odd while the slot is being written
+                          ("frame_seq", numpy.uint32), ("count", numpy.uint32),
+                          ("secs", numpy.uint32), ("nsecs", numpy.uint32),
+                          ("angle_min", numpy.float64), ("angle_increment", numpy.float64),
+                          ("range_min", numpy.float64), ("range_max", numpy.float64),
+                          ("ranges", numpy.float32, (beams,))])
+    return numpy.dtype({"names": fields.names, "formats": [fields.fields[name][0] for name in fields.names],
+                        "offsets": [fields.fields[name][1] for name in fields.names],
+                        "itemsize": (fields.itemsize + 63) // 64 * 64})
+
+
+class _DevShm(object):
+    # the part of shared_memory.SharedMemory the ring uses, over the /dev/shm file shared_memory makes on
+    # linux. readers always attach this way, as SharedMemory would register them with multiprocessing's
+    # resource tracker, which unlinks the ring when they exit (before python 3.13)
+
+    def __init__(self, name, create=False, size=0):
+        self.name = name
+        self._path = os.path.join("/dev/shm", name)
+        fd = os.open(self._path, os.O_RDWR | (os.O_CREAT | os.O_EXCL if create else 0), 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self.buf = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.buf.close()
+
+    def unlink(self):
+        os.unlink(self._path)
+
+
+def _open(name, create, size):
+    if create and os.path.exists(os.path.join("/dev/shm", name)):
+        os.unlink(os.path.join("/dev/shm", name)) # left by a writer that did not close it, readers re-attach
+    if create and shared_memory is not None:
+        return shared_memory.SharedMemory(name, True, size)
+    return _DevShm(name, create, size)
+
+def _inode(name):
+    try:
+        return os.stat(os.path.join("/dev/shm", name)).st_ino
+    except OSError:
+        return None
+
+
+class Header(object):
+
+    def __init__(self, seq, stamp):
+        self.seq = seq
+        self.stamp = stamp
+
+
+class RingScan(object):
+    '''The parts of a sensor_msgs/LaserScan the scan consumers read. ranges is a float32 view of the
+    slot, which the writer reuses after `slots` more scans, intact() tells if it did. With copy
+    ranges is a copy of its own and the scan stays intact.'''
+
+    def __init__(self, ring, slot, seq, stamp, copy=False):
+        self.ring = ring
+        self.slot = slot
+        self.ring_seq = seq
+        self.header = Header(int(slot["frame_seq"]), stamp)
+        self.angle_min = float(slot["angle_min"])
+        self.angle_increment = float(slot["angle_increment"])
+        self.range_min = float(slot["range_min"])
+        self.range_max = float(slot["range_max"])
+        self.ranges = slot["ranges"][:int(slot["count"])]
+        if copy:
+            self.ranges = self.ranges.copy()
+        self.copied = copy
+
+    def in_slot(self):
+        # the slot still holds this scan, so everything read from it so far was this scan's
+        return self.slot["seq"] == self.ring_seq
+
+    def intact(self):
+        return self.copied or self.in_slot()
+
+
+class ScanRing(object):
+    '''Fixed ring of `slots` scans of up to `beams` float32 ranges in shared memory named name.
+    create=True makes the ring for the one writer, readers attach with create=False.
+
+    Each slot is a seqlock: the writer makes its seq odd, writes the scan, then sets seq to
+    2*(n+1) for the n-th scan written and publishes n+1 in the header. A reader takes the slot of
+    the newest scan when its seq is still the one the header promised, and can check intact()
+    once it is done with the zero copy view.'''
+
+    def __init__(self, name, beams=None, slots=8, create=False):
+        if create:
+            size = HEADER_SIZE + slots * slot_dtype(beams).itemsize
+            self.memory = _open(name, True, size)
+        else:
+            self.memory = _open(name, False, 0)
+        header = numpy.ndarray((), HEADER_DTYPE, buffer=self.memory.buf)
+        if create:
+            header["slots"] = slots
+            header["beams"] = beams
+            header["written"] = 0
+            header["magic"] = MAGIC
+        elif header["magic"] != MAGIC:
+            raise ValueError("shared memory %r is not a scan ring" % name)
+        self.name = name
+        self.created = create
+        self.inode = _inode(name)
+        self.header = header
+        self.beams = int(header["beams"])
+        self.slots = numpy.ndarray(int(header["slots"]), slot_dtype(self.beams), buffer=self.memory.buf,
+                                   offset=HEADER_SIZE)
+
+    @property
+    def written(self):
+        return int(self.header["written"])
+
+    def write(self, frame_seq, secs, nsecs, angle_min, angle_increment, range_min, range_max, ranges):
+        # writer only, returns the number of scans written
+        count = len(ranges)
+        if count > self.beams:
+            raise ValueError("scan of %d ranges does not fit in a ring of %d beams" % (count, self.beams))
+        written = self.written
+        slot = self.slots[written % len(self.slots)]
+        slot["seq"] = 2*written + 1
+        slot["frame_seq"] = frame_seq
+        slot["count"] = count
+        slot["secs"] = secs
+        slot["nsecs"] = nsecs
+        slot["angle_min"] = angle_min
+        slot["angle_increment"] = angle_increment
+        slot["range_min"] = range_min
+        slot["range_max"] = range_max
+        slot["ranges"][:count] = ranges
+        slot["seq"] = 2*written + 2
+        self.header["written"] = written + 1
+        return written + 1
+
+    def latest(self, stamp=None, copy=False):
+        '''RingScan of the newest scan, None if nothing was written yet or the writer lapped the
+        reader three times in a row. stamp makes header.stamp from (secs, nsecs), rospy.Time for
+        the nodes, float seconds by default. copy takes the ranges out of the slot, checked to be
+        the scan's once copied.'''
+        for _ in range(3):
+            written = self.written
+            if written == 0:
+                return None
+            slot = self.slots[(written - 1) % len(self.slots)]
+            seq = slot["seq"]
+            if seq != 2*written:
+                continue # being rewritten already
+            secs, nsecs = int(slot["secs"]), int(slot["nsecs"])
+            scan = RingScan(self, slot, seq, secs + nsecs*1e-9 if stamp is None else stamp(secs, nsecs), copy)
+            if scan.in_slot():
+                return scan
+        return None
+
+    def close(self):
+        self.slots = None
+        self.header = None
+        if self.created:
+            self.memory.unlink()
+        try:
+            self.memory.close()
+        except BufferError:
+            pass # scans handed out still view the memory, it is unmapped once they are gone
+
+
+class RingReader(threading.Thread):
+    '''Polls a ScanRing every `poll` seconds and calls callback with every new RingScan, the way a
+    rospy.Subscriber with queue_size 1 would. The scans are copies, callbacks can keep them (the
+    driver's mailbox does) while the writer reuses their slots. Waits for the ring to be created, and attaches to the
+    new ring when no scan came for `reattach` seconds and the writer has made another one.'''
+
+    def __init__(self, name, callback, poll=0.001, stamp=None, is_shutdown=lambda: False, reattach=1.0):
+        threading.Thread.__init__(self, name="scan ring %s" % name)
+        self.daemon = True
+        self.ring_name = name
+        self.callback = callback
+        self.poll = poll
+        self.stamp = stamp
+        self.is_shutdown = is_shutdown
+        self.reattach = reattach
+        self.stopped = False
+        self.missed = 0 # scans written while the callback was busy
+
+    def _attach(self):
+        while not self.stopped and not self.is_shutdown():
+            try:
+                return ScanRing(self.ring_name)
+            except (OSError, IOError, ValueError):
+                time.sleep(0.1)
+        return None
+
+    def run(self):
+        ring = self._attach()
+        last = 0
+        idle_since = time.time()
+        while ring is not None and not self.stopped and not self.is_shutdown():
+            written = ring.written
+            if written == last:
+                if time.time() - idle_since > self.reattach and _inode(self.ring_name) not in (None, ring.inode):
+                    ring.close()
+                    ring = self._attach()
+                    last = 0
+                    idle_since = time.time()
+                time.sleep(self.poll)
+                continue
+            scan = ring.latest(self.stamp, copy=True)
+            if scan is None:
+                time.sleep(self.poll) # lapped by the writer
+                continue
+            newest = scan.ring_seq // 2
+            self.missed += max(newest - last - 1, 0)
+            last = newest
+            idle_since = time.time()
+            self.callback(scan)
+        if ring is not None:
+            ring.close()
+
+    def unregister(self):
+        self.stopped = True
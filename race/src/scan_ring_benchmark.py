@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# latency and CPU of handing 40 Hz scans to 1, 4 and 8 reader processes through the shared memory ring
+# and through loopback TCPROS (needs a roscore), every reader and writer in a process of its own
+
+import argparse
+import math
+import multiprocessing
+import os
+import time
+import numpy
+
+import scan_ring
+
+BEAMS = 1081
+RING = "race_scan_benchmark"
+TOPIC = "/scan_ring_benchmark"
+
+
+def cpu_time():
+    # user + system seconds of this process
+    times = os.times()
+    return times[0] + times[1]
+
+def make_ranges(seq):
+    return numpy.full(BEAMS, 1.0 + seq % 10, dtype=numpy.float32)
+
+
+def shm_writer(rate, seconds, ready):
+    ring = scan_ring.ScanRing(RING, BEAMS, create=True)
+    ready.set()
+    time.sleep(1.0) # readers attach
+    start, start_cpu = time.time(), cpu_time()
+    for seq in range(int(rate * seconds)):
+        now = time.time()
+        ring.write(seq, int(now), int((now % 1) * 1e9), -3*math.pi/4, math.radians(0.25), 0.06, 30.0,
+                   make_ranges(seq))
+        time.sleep(max(0.0, 1.0/rate - (time.time() - now)))
+    cpu = (cpu_time() - start_cpu) / (time.time() - start)
+    time.sleep(0.5)
+    ring.close()
+    return cpu
+
+def shm_reader(seconds, results, poll):
+    latencies = []
+    def callback(scan):
+        latencies.append(time.time() - scan.header.stamp)
+        scan.ranges.min() # the smallest use of the scan, so it is read
+    reader = scan_ring.RingReader(RING, callback, poll=poll)
+    start, start_cpu = time.time(), cpu_time()
+    reader.start()
+    time.sleep(seconds + 1.5)
+    reader.unregister()
+    reader.join()
+    results.put((latencies, (cpu_time() - start_cpu) / (time.time() - start)))
+
+
+def ros_writer(rate, seconds, readers):
+    import rospy
+    from rospy.numpy_msg import numpy_msg
+    from sensor_msgs.msg import LaserScan
+    rospy.init_node("scan_ring_benchmark_writer", anonymous=True)
+    pub = rospy.Publisher(TOPIC, numpy_msg(LaserScan), queue_size=1)
+    while pub.get_num_connections() < readers and not rospy.is_shutdown():
+        time.sleep(0.05)
+    time.sleep(0.5)
+    msg = numpy_msg(LaserScan)()
+    msg.angle_min = -3*math.pi/4
+    msg.angle_increment = math.radians(0.25)
+    msg.range_min = 0.06
+    msg.range_max = 30.0
+    start, start_cpu = time.time(), cpu_time()
+    for seq in range(int(rate * seconds)):
+        now = time.time()
+        msg.header.seq = seq
+        msg.header.stamp = rospy.Time.from_sec(now)
+        msg.ranges = make_ranges(seq)
+        pub.publish(msg)
+        time.sleep(max(0.0, 1.0/rate - (time.time() - now)))
+    return (cpu_time() - start_cpu) / (time.time() - start)
+
+def ros_reader(seconds, results, poll):
+    import rospy
+    from rospy.numpy_msg import numpy_msg
+    from sensor_msgs.msg import LaserScan
+    rospy.init_node("scan_ring_benchmark_reader", anonymous=True)
+    latencies = []
+    def callback(scan):
+        latencies.append(time.time() - scan.header.stamp.to_sec())
+        scan.ranges.min()
+    start, start_cpu = time.time(), cpu_time()
+    rospy.Subscriber(TOPIC, numpy_msg(LaserScan), callback, queue_size=1)
+    time.sleep(seconds + 3.0)
+    results.put((latencies, (cpu_time() - start_cpu) / (time.time() - start)))
+
+
+def writer_process(transport, rate, seconds, readers, ready, results):
+    if transport == "shm":
+        results.put(shm_writer(rate, seconds, ready))
+    else:
+        ready.set()
+        results.put(ros_writer(rate, seconds, readers))
+
+def run(transport, readers, rate, seconds, poll):
+    '''(latencies of every scan every reader got, mean CPU of a reader and CPU of the writer, in
+    CPU seconds per second)'''
+    results = multiprocessing.Queue()
+    writer_results = multiprocessing.Queue()
+    ready = multiprocessing.Event()
+    writer = multiprocessing.Process(target=writer_process,
+                                     args=(transport, rate, seconds, readers, ready, writer_results))
+    writer.start()
+    ready.wait()
+    target = shm_reader if transport == "shm" else ros_reader
+    processes = [multiprocessing.Process(target=target, args=(seconds, results, poll)) for _ in range(readers)]
+    for process in processes:
+        process.start()
+    gathered = [results.get() for _ in processes]
+    writer_cpu = writer_results.get()
+    for process in processes + [writer]:
+        process.join()
+    latencies = numpy.concatenate([numpy.asarray(latency) for latency, _ in gathered])
+    return latencies, numpy.mean([cpu for _, cpu in gathered]), writer_cpu
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare scan delivery through the shared memory ring and TCPROS")
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--transport", choices=["shm", "ros"], nargs="+", default=["shm", "ros"],
+                        help="ros needs a running roscore")
+    parser.add_argument("--rate", type=float, default=40.0, help="scans per second")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--poll", type=float, default=0.001, help="ring reader poll period, seconds")
+    args = parser.parse_args()
+
+    print("%-9s %7s %8s %8s %8s %11s %11s" % ("transport", "readers", "scans", "p50 ms", "p99 ms",
+                                               "reader CPU", "writer CPU"))
+    for transport in args.transport:
+        for readers in args.readers:
+            latencies, reader_cpu, writer_cpu = run(transport, readers, args.rate, args.seconds, args.poll)
+            print("%-9s %7d %8d %8.3f %8.3f %10.1f%% %10.1f%%" % (
+                transport, readers, len(latencies), 1000*numpy.percentile(latencies, 50),
+                1000*numpy.percentile(latencies, 99), 100*reader_cpu, 100*writer_cpu))
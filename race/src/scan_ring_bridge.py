@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# copies every scan into the shared memory ring, nodes started with /use_scan_ring read it from there
+# instead of each deserializing its own copy of the scan
+
+import rospy
+
+import scan_ring
+import scan_utils
+
+
+class ScanRingBridge(object):
+    '''Writes the scans of the scan topic into a ScanRing, created on the first scan so it has
+    room for ~beams ranges, the first scan's count by default.'''
+
+    def __init__(self, subscribe=True):
+        self.name = rospy.get_param('/scan_ring', scan_ring.DEFAULT_NAME)
+        self.slots = rospy.get_param('~slots', 8) # a scan handed to a reader stays intact for this many scans
+        self.beams = rospy.get_param('~beams', None)
+        self.ring = None
+        if subscribe:
+            scan_utils.subscribe_scan(self.callback, ring=False, queue_size=1)
+
+    def callback(self, data):
+        if self.ring is None:
+            self.ring = scan_ring.ScanRing(self.name, self.beams or len(data.ranges), self.slots, create=True)
+        stamp = data.header.stamp
+        self.ring.write(data.header.seq, stamp.secs, stamp.nsecs, data.angle_min, data.angle_increment,
+                        data.range_min, data.range_max, data.ranges)
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+
+
+if __name__ == '__main__':
+    rospy.init_node('scan_ring_bridge', anonymous=True)
+    bridge = ScanRingBridge()
+    rospy.on_shutdown(bridge.close)
+    rospy.spin()
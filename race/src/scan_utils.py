@@ -0,0 +1,196 @@
+# LaserScan subscription and lookups shared by the scan consumers (driver_ai, dist_finder, obstacle_detector,
+# goFastOrGoHome). every scan is checked for valid readings once, however many angles a node looks up in it
+
+import math
+import numpy
+
+INDEX_MEMO_SIZE = 1024 # angles remembered per geometry, the nodes look up a handful of fixed angles and a few computed ones
+
+
+class ScanGeometry(object):
+    '''The beam layout of a LaserScan. Angles become beam indices the way the nodes always
+    computed them, int((theta - angle_min) / angle_increment), and the index of every angle
+    looked up is remembered until the layout changes.'''
+
+    def __init__(self, angle_min, angle_increment, count):
+        self.angle_min = angle_min
+        self.angle_increment = angle_increment
+        self.count = count
+        self._index = {}
+
+    def index(self, theta):
+        if theta not in self._index:
+            if len(self._index) >= INDEX_MEMO_SIZE:
+                self._index.clear()
+            self._index[theta] = int((theta - self.angle_min) / self.angle_increment)
+        return self._index[theta]
+
+
+_geometry = None
+
+def scan_geometry(data):
+    # the ScanGeometry of a LaserScan, kept until a scan with another layout arrives
+    # read once, node_container runs several nodes using this module in threads of one process
+    global _geometry
+    geometry = _geometry
+    if (geometry is None or geometry.angle_min != data.angle_min
+            or geometry.angle_increment != data.angle_increment or geometry.count != len(data.ranges)):
+        geometry = _geometry = ScanGeometry(data.angle_min, data.angle_increment, len(data.ranges))
+    return geometry
+
+
+def nearest_valid(valid):
+    '''Index of the nearest valid beam of every beam of a boolean array, the beam itself if it is
+    valid. Ties go to the higher index. -1 everywhere if no beam is valid.'''
+    count = len(valid)
+    index = numpy.arange(count)
+    if not valid.any():
+        return numpy.full(count, -1, dtype=numpy.intp)
+    # closest valid beam at or below and at or above every beam, count past the end where there is none
+    below = numpy.maximum.accumulate(numpy.where(valid, index, -count))
+    above = numpy.minimum.accumulate(numpy.where(valid, index, 2*count)[::-1])[::-1]
+    return numpy.where(above - index <= index - below, above, below)
+
+
+class ValidScan(object):
+    '''The ranges of one LaserScan with their validity worked out once.
+    in_range - not NaN and within [range_min, range_max], the readings get_range returns
+    usable - not NaN and over range_min, the readings get_some_scans returns
+    fill - index of the nearest in_range beam of every beam, see nearest_valid'''
+
+    def __init__(self, data):
+        self.data = data
+        self.geometry = scan_geometry(data)
+        self.ranges = numpy.asarray(data.ranges)
+        valid = ~numpy.isnan(self.ranges)
+        self.in_range = valid & (self.ranges >= data.range_min) & (self.ranges <= data.range_max)
+        self.usable = valid & (self.ranges > data.range_min)
+        self._fill = None
+
+    @property
+    def fill(self):
+        # only built for scans get_range is used on
+        if self._fill is None:
+            self._fill = nearest_valid(self.in_range)
+        return self._fill
+
+
+_scan = None
+
+def valid_scan(data):
+    # the ValidScan of a LaserScan, the last one is kept so every lookup in a callback shares it
+    global _scan
+    scan = _scan
+    if scan is None or scan.data is not data:
+        scan = _scan = ValidScan(data)
+    return scan
+
+
+def get_range(data, theta):
+    '''Reading of the beam at angle theta (radians, 0 straight ahead), or of the nearest beam with a
+    valid reading, the one at the higher index on ties. None if theta is outside the scan or no
+    reading is valid.'''
+    scan = valid_scan(data)
+    idx = scan.geometry.index(theta)
+    if idx < 0 or idx >= len(scan.ranges) or scan.fill[idx] < 0:
+        return None
+    return float(scan.ranges[scan.fill[idx]])
+
+def get_some_scans(data, theta_start, theta_end):
+    '''Array of the usable readings from angle theta_start up to theta_end (radians),
+    None if theta_start is past theta_end'''
+    if theta_start > theta_end:
+        return None
+    scan = valid_scan(data)
+    start = scan.geometry.index(theta_start)
+    end = scan.geometry.index(theta_end)
+    return scan.ranges[start:end][scan.usable[start:end]]
+
+
+#-------------------------------------------------------------------------------------
+# features the wall following nodes compute from a scan. data is a LaserScan, or a scan_features
+# message of scan_feature_server when the node subscribed with subscribe_scan_or_features
+
+WALL_SWING = math.radians(50) # angle between the two beams a wall is measured with
+SIDES = (-1, 1) # SIDE of the nodes, -1 is the left wall and 1 the right one
+
+def from_features(data):
+    return hasattr(data, "front_fraction")
+
+def wall(data, side, swing=WALL_SWING):
+    '''(alpha, dist) of the wall on side, measured the way dist_finder always did from the readings a at
+    side*(swing - pi/2) and b at side*(-pi/2). alpha is the angle of the wall to the car, times side,
+    and dist the distance to it. None if the scan has no valid reading, from a scan or its features.'''
+    if from_features(data):
+        if side < 0:
+            alpha, dist = data.left_alpha, data.left_dist
+        else:
+            alpha, dist = data.right_alpha, data.right_dist
+        if math.isnan(alpha) or math.isnan(dist):
+            return None
+        return alpha, dist
+    a = get_range(data, side * (-math.pi/2 + swing))
+    b = get_range(data, side * (-math.pi/2))
+    if a is None or b is None:
+        return None
+    alpha = side * math.atan((a*math.cos(swing) - b)/(a*math.sin(swing)))
+    return alpha, b*math.cos(alpha)
+
+def front_fraction(data, threshold, half_width=0.15):
+    '''Fraction of the usable readings under threshold in the front cone, as wide as the readings at
+    threshold that are within half_width of the centre line. NaN if the cone has no usable reading.
+    From a scan_features message it is interpolated between the thresholds it was computed for, a
+    threshold outside them raises ValueError rather than taking the fraction of the nearest one.'''
+    if from_features(data):
+        thresholds = data.front_thresholds
+        if not thresholds[0] - 1e-6 <= threshold <= thresholds[-1] + 1e-6:
+            raise ValueError("front threshold %.3f m is outside the %.3f to %.3f m scan_feature_server computed, "
+                             "see its ~front_threshold_min and ~front_threshold_max" % (threshold, thresholds[0], thresholds[-1]))
+        return numpy.interp(threshold, thresholds, data.front_fraction)
+    theta = math.asin(half_width/threshold)
+    distances = get_some_scans(data, -theta, theta)
+    if len(distances) == 0:
+        return float("nan")
+    return numpy.mean(distances < threshold)
+
+def nearest_reading(data, theta_start=-math.pi/2, theta_end=math.pi/2):
+    # (range, angle) of the closest in_range reading from theta_start up to theta_end, NaNs if there is none
+    scan = valid_scan(data)
+    start = max(scan.geometry.index(theta_start), 0)
+    end = scan.geometry.index(theta_end)
+    readings = numpy.where(scan.in_range[start:end], scan.ranges[start:end], numpy.inf)
+    if len(readings) == 0 or numpy.isinf(readings.min()):
+        return float("nan"), float("nan")
+    idx = int(numpy.argmin(readings))
+    return float(readings[idx]), scan.geometry.angle_min + (start + idx) * scan.geometry.angle_increment
+
+
+def subscribe_scan(callback, topic='scan', ring=None, **kwargs):
+    '''rospy.Subscriber for a LaserScan topic that deserializes ranges and intensities as read only
+    float32 numpy arrays over the received buffer, instead of building tuples of Python floats.
+    kwargs are passed on to rospy.Subscriber.
+    ring - read the scans from scan_ring_bridge's shared memory ring (named by the /scan_ring parameter)
+           instead, None to do so when the /use_scan_ring parameter is set. The callback then gets
+           scan_ring.RingScans copied out of the ring, newest scan only.'''
+    # imported here so the lookups above work without ROS, in tests and offline tools
+    import rospy
+    if ring is None:
+        ring = rospy.get_param("/use_scan_ring", False)
+    if ring:
+        import scan_ring
+        reader = scan_ring.RingReader(rospy.get_param("/scan_ring", scan_ring.DEFAULT_NAME), callback,
+                                      stamp=rospy.Time, is_shutdown=rospy.is_shutdown)
+        reader.start()
+        return reader
+    from rospy.numpy_msg import numpy_msg
+    from sensor_msgs.msg import LaserScan
+    return rospy.Subscriber(topic, numpy_msg(LaserScan), callback, **kwargs)
+
+def subscribe_scan_or_features(callback, topic='scan', **kwargs):
+    '''Subscribes callback to scan_feature_server's scan_features when the /use_scan_features parameter is
+    set, and to the scans themselves otherwise. wall and front_fraction accept either message.'''
+    import rospy
+    from race.msg import scan_features
+    if rospy.get_param("/use_scan_features", False):
+        return rospy.Subscriber('scan_features', scan_features, callback, **kwargs)
+    return subscribe_scan(callback, topic, **kwargs)
@@ -1,5 +1,6 @@
 # python conceptual racecar code for virtual model
 import math
+import numpy as np
 
 deltaTime = 0.033
 
@@ -18,7 +19,7 @@ class Racecar():
         self.fricCoeff = 10 # coefficient of friction between ground and tires
         self.carLength = 20 # length of car determines smallest turn radius
         self.reading_number = 90
-        self.lidar = [0]*self.reading_number
+        self.lidar = np.zeros(self.reading_number)
 
     def _magnitude(self, vector):
         return math.sqrt(vector[0]**2 + vector[1]**2)
@@ -84,10 +85,10 @@ class Racecar():
 
     def lidar_readings(self, track:"Track"):
         angle = math.pi / self.reading_number
-        for i in range(self.reading_number):
-            slope = self._angle - math.pi/2 + angle*i
-            self.lidar[i] = self.ray_trace(slope, track)
+        slopes = self._angle - math.pi/2 + angle*np.arange(self.reading_number)
+        self.lidar = track.ray_cast(self._position, slopes)
 
+    # reference ray marcher, lidar_readings uses the closed form Track.ray_cast instead
     def ray_trace(self, angle, track:"Track"):
         ray_length = 1
         point = (self._position[0] + math.cos(angle)*ray_length,
@@ -98,14 +99,21 @@ class Racecar():
                      self._position[1] + math.sin(angle)*ray_length)
         return ray_length
 
-    def draw_lidar(self, screen:"tkinter.Canvas"):
+    def lidar_coords(self):
+        # flat canvas coordinates of one polyline that goes out along every beam and back to the car
         angle = math.pi / self.reading_number
-        for i in range(self.reading_number):
-            slope = self._angle - math.pi/2 + angle*i
-            color = "#555555"
-            screen.create_line(self._position[0], self._position[1],
-                               self._position[0] + math.cos(slope)*self.lidar[i],
-                               self._position[1] + math.sin(slope)*self.lidar[i], fill=color)
+        slopes = self._angle - math.pi/2 + angle*np.arange(self.reading_number)
+        lengths = np.where(np.isfinite(self.lidar), self.lidar, 0)
+        coords = np.empty((self.reading_number, 2, 2))
+        coords[:, 0, 0] = self._position[0]
+        coords[:, 0, 1] = self._position[1]
+        coords[:, 1, 0] = self._position[0] + np.cos(slopes)*lengths
+        coords[:, 1, 1] = self._position[1] + np.sin(slopes)*lengths
+        return coords.ravel().tolist()
+
+    def draw_lidar(self, screen:"tkinter.Canvas"):
+        color = "#555555"
+        return screen.create_line(*self.lidar_coords(), fill=color)
             
 
     def changeMotorSpeed(self, val):
@@ -58,6 +58,12 @@ class RacecarAI:
             self.codriver = Codriver(car) # in ROS, Codriver will just be a seperate node
         self.fricCoeff = 10 # this will have to be adjusted to a realistic value
         self.safetyMode = False
+
+        ''' Tuning knobs. slowdown_distance and steer_gain are named after the real driver's (driver_ai.py),
+        speed_scale is a plain multiplier and not the real driver's speed_factor speed cap'''
+        self.speed_scale = 1.0 # scales the speed chosen from the front distance
+        self.slowdown_distance = 0 # drive at minimum speed when the front distance is below this, 0 disables it
+        self.steer_gain = 0.2 # fraction of the angle error corrected each frame in autoProgram
         
         ''' Variables for collision avoidance'''
         self.collisionAvoid = False
@@ -90,7 +96,7 @@ class RacecarAI:
         #draw line just for gui visual
         self.screen.create_line(self.car._position[0], self.car._position[1],
                                self.car._position[0] + math.cos(new_angle + self.car._angle)*50,
-                               self.car._position[1] + math.sin(new_angle + self.car._angle)*50, fill="#00FFFF")
+                               self.car._position[1] + math.sin(new_angle + self.car._angle)*50, fill="#00FFFF", tags="debug")
 
         return new_angle
 
@@ -157,7 +163,10 @@ class RacecarAI:
             self.collisionAvoid = True
         
         #SET CAR VELOCITY PROPORTIONAL TO FRONT DISTANCE
-        motor_speed = int(15 + 50*(front_dist/500))
+        if front_dist < self.slowdown_distance:
+            motor_speed = 15 # if obstacle up ahead but not imminent, lower speed to minimum
+        else:
+            motor_speed = int((15 + 50*(front_dist/500)) * self.speed_scale)
         self.car.changeMotorSpeed(motor_speed)
 
         #DETERMINE ANGLE TO TURN WHEELS TO
@@ -193,10 +202,9 @@ class RacecarAI:
         ''' The intensity of angle change is preportional to the difference in current angle and desired angle'''
         diff = abs(new_angle - self.car.turnAngle)
         if(new_angle > self.car.turnAngle): # right
-            # todo, clarify 0.2 constant
-            self.car.changeTurnAngle(self.car.turnAngle + 0.2*diff)
+            self.car.changeTurnAngle(self.car.turnAngle + self.steer_gain*diff)
         elif(new_angle < self.car.turnAngle): # left
-            self.car.changeTurnAngle(self.car.turnAngle - 0.2*diff)
+            self.car.changeTurnAngle(self.car.turnAngle - self.steer_gain*diff)
 
         # update the start angle for decision nodes
         ''' During a turn, the start_angle is not updated, and is used a reference to measure how much the car has turned'''
@@ -249,16 +257,19 @@ class RacecarAI:
         
         colors = ["#007777","#770077","#777700","#007700","#000077"]
         for seg in range(len(segments)):
+            # one polyline per segment, out along each beam and back to the car
+            coords = []
             for i in range(segments[seg][0], segments[seg][1]):
                 slope = self.car._angle - math.pi/2 + angle*i
-                color = "#555500"
-                self.screen.create_line(self.car._position[0], self.car._position[1],
-                                   self.car._position[0] + math.cos(slope)*self.car.lidar[i],
-                                   self.car._position[1] + math.sin(slope)*self.car.lidar[i], fill=colors[seg])
+                coords += [self.car._position[0], self.car._position[1],
+                           self.car._position[0] + math.cos(slope)*self.car.lidar[i],
+                           self.car._position[1] + math.sin(slope)*self.car.lidar[i]]
+            if coords:
+                self.screen.create_line(*coords, fill=colors[seg % len(colors)], tags="debug")
 
         self.screen.create_line(self.car._position[0], self.car._position[1],
                                self.car._position[0] + math.cos(ans + self.car._angle)*100,
-                               self.car._position[1] + math.sin(ans + self.car._angle)*100, fill="#FFFFFF")
+                               self.car._position[1] + math.sin(ans + self.car._angle)*100, fill="#FFFFFF", tags="debug")
         
         return ans
 
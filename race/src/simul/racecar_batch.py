@@ -0,0 +1,123 @@
+# N racecars kept as NumPy arrays, stepped together with the same kinematics as python_racecar.Racecar
+
+import math
+import numpy as np
+import python_racecar
+
+
+class RacecarBatch():
+    '''Struct-of-arrays version of Racecar. Every per car variable is an array with
+    one entry per car, so a physics step or a lidar sweep for all cars is one array op.
+    '''
+
+    def __init__(self, xPos, yPos, ang):
+        # xPos, yPos, ang - sequences with one start pose per car
+        xPos = np.asarray(xPos, dtype=float)
+        yPos = np.asarray(yPos, dtype=float)
+        self._position = np.stack([xPos, yPos], axis=-1) # (N, 2) positions of the cars on the map
+        self._angle = np.array(ang, dtype=float) # angle of each car with respect to the map
+        count = len(self._angle)
+
+        self.mass = 10 # mass of car
+        self.velocity = np.zeros(count)
+        self.motorSpeed = np.zeros(count)
+        self.turnAngle = np.zeros(count) # angle wheels are facing, 0 is forwards
+        self.fricCoeff = 10 # coefficient of friction between ground and tires
+        self.carLength = 20 # length of car determines smallest turn radius
+        self.reading_number = 90
+        self.lidar = np.zeros((count, self.reading_number))
+        self.active = np.ones(count, dtype=bool) # cars that crashed stop moving
+
+    @classmethod
+    def from_poses(cls, poses):
+        # poses - (N, 3) array of (x, y, angle)
+        poses = np.asarray(poses, dtype=float)
+        return cls(poses[:, 0], poses[:, 1], poses[:, 2])
+
+    def __len__(self):
+        return len(self._angle)
+
+    # called to update the velocity and pose of every car with respect to motor speed
+    def _update_motors(self):
+        dt = python_racecar.deltaTime
+        grip = 9.81*self.fricCoeff
+        turnRad = np.tan(self.turnAngle + math.pi/2) * self.carLength
+
+        '''update velocity based on motor speed'''
+        deltaVel = np.clip(self.motorSpeed - self.velocity, -grip*dt, grip*dt)
+        velocity = np.where(self.active, self.velocity + deltaVel, self.velocity)
+
+        turning = ((self.turnAngle > 0.01) | (self.turnAngle < -0.01)) & (np.abs(velocity**2/turnRad) <= grip)
+
+        # turning cars move around the centre of their turn circle
+        signed_vel = np.where(self.turnAngle < 0, velocity, -velocity)
+        radDist = signed_vel * dt * 2*math.pi / turnRad
+        turnCenterX = self._position[:, 0] - np.cos(self._angle + math.pi/2) * turnRad
+        turnCenterY = self._position[:, 1] - np.sin(self._angle + math.pi/2) * turnRad
+        positive = turnRad > 0
+        arcX = np.where(positive,
+                        turnCenterX + turnRad * np.cos(self._angle + math.pi/2 - radDist),
+                        turnCenterX - turnRad * np.cos(self._angle - math.pi/2 + radDist))
+        arcY = np.where(positive,
+                        turnCenterY + turnRad * np.sin(self._angle + math.pi/2 - radDist),
+                        turnCenterY - turnRad * np.sin(self._angle - math.pi/2 + radDist))
+        arcAngle = np.where(positive, self._angle - radDist, self._angle + radDist)
+
+        # the rest drive straight ahead
+        lineX = self._position[:, 0] + velocity * dt * 2*math.pi * np.cos(self._angle)
+        lineY = self._position[:, 1] + velocity * dt * 2*math.pi * np.sin(self._angle)
+
+        move = self.active
+        self.velocity = velocity
+        self._position[:, 0] = np.where(move, np.where(turning, arcX, lineX), self._position[:, 0])
+        self._position[:, 1] = np.where(move, np.where(turning, arcY, lineY), self._position[:, 1])
+        self._angle = np.where(move & turning, arcAngle, self._angle)
+
+    #called to update the position and velocity of every car by one frame
+    def _update_pos(self):
+        self._update_motors()
+
+    def lidar_readings(self, track:"Track"):
+        angle = math.pi / self.reading_number
+        slopes = (self._angle - math.pi/2)[:, np.newaxis] + angle*np.arange(self.reading_number)
+        self.lidar = track.ray_cast(self._position, slopes)
+
+    def check_crash(self, track:"Track"):
+        # marks cars sitting in an obstacle as inactive and returns which cars crashed
+        crashed = track.check_collision_many(self._position)
+        self.active &= ~crashed
+        return crashed
+
+    def changeMotorSpeed(self, val):
+        self.motorSpeed = np.broadcast_to(np.asarray(val, dtype=float), self.motorSpeed.shape).copy()
+
+    def changeTurnAngle(self, ang):
+        self.turnAngle = np.clip(np.broadcast_to(np.asarray(ang, dtype=float), self.turnAngle.shape),
+                                 -math.pi/4, math.pi/4)
+
+    def car(self, i):
+        '''Copies car i into a single Racecar, handy for drawing or debugging one rollout'''
+        car = python_racecar.Racecar(self._position[i, 0], self._position[i, 1], self._angle[i])
+        car.velocity = self.velocity[i]
+        car.motorSpeed = self.motorSpeed[i]
+        car.turnAngle = self.turnAngle[i]
+        car.lidar = self.lidar[i].copy()
+        return car
+
+
+def rollout(batch:"RacecarBatch", track:"Track", policy, steps):
+    '''Runs every car in the batch for a number of steps.
+    policy(batch) is called after each lidar sweep and sets the controls of all cars at
+    once, e.g. with batch.changeMotorSpeed(...) and batch.changeTurnAngle(...).
+    Returns the step at which each car crashed, -1 for cars that never crashed.
+    '''
+    crash_step = np.full(len(batch), -1)
+    for step in range(steps):
+        batch._update_pos()
+        batch.lidar_readings(track)
+        crashed = batch.check_crash(track) & (crash_step < 0)
+        crash_step[crashed] = step
+        if not batch.active.any():
+            break
+        policy(batch)
+    return crash_step
@@ -0,0 +1,182 @@
+# benchmarks for the simulator hot paths, run with: python racecar_bench.py --json results.json
+
+import argparse
+import json
+import math
+import platform
+import random
+import time
+import numpy as np
+import python_racecar
+import racecar_map
+import racecar_sim
+
+
+def random_track(count, width=800, height=600, size=40, seed=0):
+    '''Track with count randomly placed rectangular obstacles, used to see how queries scale'''
+    rng = random.Random(seed)
+    obstacles = []
+    for i in range(count):
+        x = rng.uniform(0, width - size)
+        y = rng.uniform(0, height - size)
+        w = rng.uniform(5, size)
+        h = rng.uniform(5, size)
+        obstacles.append(racecar_map.Square(y, y + h, x, x + w))
+    return racecar_map.Track(obstacles)
+
+def _linear_collision(track, point):
+    # the scan Track.check_collision did before it had a spatial index
+    for item in track.obstacles:
+        if item.intersect(point):
+            return True
+    return False
+
+def _linear_ray_cast(track, origin, angles):
+    # Track.ray_cast testing every ray against every obstacle, as it did before walking the grid
+    n = np.newaxis
+    dist = track._first_steps(origin[0], origin[1], np.cos(angles)[:, n], np.sin(angles)[:, n],
+                              track._left, track._right, track._top, track._bottom)
+    return dist.min(axis=-1)
+
+def _time_per_call(func, args, repeat=3):
+    # best of repeat runs, in seconds per call
+    best = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        for arg in args:
+            func(*arg)
+        best = min(best, (time.perf_counter() - start) / len(args))
+    return best
+
+def bench_track_queries(counts=(16, 100, 1000, 5000), queries=2000, seed=0, scans=20, beams=1081):
+    '''Point, segment and lidar scan query cost against the number of obstacles, grid index vs a
+    linear scan. A lidar scan is one ray_cast of beams rays over the front half circle.'''
+    rng = random.Random(seed)
+    rows = []
+    for count in counts:
+        track = random_track(count, seed=seed)
+        points = [((rng.uniform(0, 800), rng.uniform(0, 600)),) for i in range(queries)]
+        segments = [((x, y), (x + rng.uniform(-30, 30), y + rng.uniform(-30, 30))) for (x, y), in points]
+        linear = _time_per_call(lambda p: _linear_collision(track, p), points)
+        grid = _time_per_call(track.check_collision, points)
+        segment = _time_per_call(track.check_segment, segments)
+        poses = [_random_pose(track, rng) for i in range(scans)]
+        rays = [(np.array([x, y]), heading + np.linspace(-math.pi/2, math.pi/2, beams)) for x, y, heading in poses]
+        ray_linear = _time_per_call(lambda origin, angles: _linear_ray_cast(track, origin, angles), rays)
+        ray_grid = _time_per_call(track.ray_cast, rays)
+        rows.append((count, linear, grid, segment, ray_linear, ray_grid))
+    return rows
+
+
+def measure(func, calls=1000, inner=1, warmup=10):
+    '''Times func() calls times in groups of inner calls (for functions too quick to time one
+    by one). Returns ops/sec and per call latency percentiles in microseconds.'''
+    for i in range(warmup):
+        func()
+    samples = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        for j in range(inner):
+            func()
+        samples[i] = (time.perf_counter() - start) / inner
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1e6
+    return {"ops_per_sec": 1.0 / samples.mean(), "mean_us": samples.mean() * 1e6,
+            "p50_us": p50, "p95_us": p95, "p99_us": p99, "calls": calls * inner}
+
+
+def _random_pose(track, rng):
+    while True:
+        x = rng.uniform(0, 800)
+        y = rng.uniform(0, 600)
+        if not track.check_collision((x, y)):
+            return x, y, rng.uniform(-math.pi, math.pi)
+
+def _gui_step():
+    # a full RaceCarView frame, only when a display is available
+    try:
+        import tkinter
+        import racecar_gui
+        view = racecar_gui.RaceCarView()
+    except (ImportError, tkinter.TclError):
+        return None
+    view.sim_running = False
+    return view._update
+
+def hot_path_cases(seed=0, obstacles=1000):
+    '''Named zero argument callables for every hot path, on fixed scenes: the default track
+    and a random track with `obstacles` obstacles, cars at seeded random free poses'''
+    rng = random.Random(seed)
+    default = racecar_map.Track()
+    large = random_track(obstacles, seed=seed)
+    cases = {}
+
+    car = python_racecar.Racecar(*_random_pose(default, rng))
+    beam = car._angle
+    cases["ray_trace"] = lambda: car.ray_trace(beam, default)
+    cases["lidar_readings/90"] = lambda: car.lidar_readings(default)
+    wide = python_racecar.Racecar(*_random_pose(default, rng))
+    wide.reading_number = 1081
+    cases["lidar_readings/1081"] = lambda: wide.lidar_readings(default)
+    crowded = python_racecar.Racecar(*_random_pose(large, rng))
+    crowded.reading_number = 1081
+    cases["lidar_readings/1081/%d_obstacles" % obstacles] = lambda: crowded.lidar_readings(large)
+
+    points = [(rng.uniform(0, 800), rng.uniform(0, 600)) for i in range(1000)]
+    cases["check_collision"] = lambda: [default.check_collision(point) for point in points]
+    cases["check_collision/%d_obstacles" % obstacles] = lambda: [large.check_collision(point) for point in points]
+
+    moving = python_racecar.Racecar(400, 300, 0)
+    moving.changeMotorSpeed(30)
+    moving.changeTurnAngle(0.2)
+    cases["_update_pos"] = moving._update_pos
+
+    sim = racecar_sim.make_simulation()
+    cases["simulation_step"] = sim.step
+    gui_step = _gui_step()
+    if gui_step is not None:
+        cases["gui_step"] = gui_step
+    return cases
+
+# calls per timing sample, so quick functions are not dominated by the timer
+INNER = {"_update_pos": 100, "ray_trace": 10}
+# check_collision cases run 1000 queries per call
+PER_CALL = {"check_collision": 1000}
+
+def run_suite(seed=0, calls=300, obstacles=1000):
+    results = {}
+    for name, func in hot_path_cases(seed, obstacles).items():
+        result = measure(func, calls, INNER.get(name, 1))
+        queries = PER_CALL.get(name.split("/")[0], 1)
+        if queries > 1:
+            result["queries_per_call"] = queries
+        results[name] = result
+        print("%-36s %12.1f ops/s  p50 %10.1f us  p95 %10.1f us  p99 %10.1f us"
+              % (name, result["ops_per_sec"], result["p50_us"], result["p95_us"], result["p99_us"]))
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": seed, "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "results": results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the simulator hot paths")
+    parser.add_argument("--json", default=None, help="save the results to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--calls", type=int, default=300, help="timing samples per benchmark")
+    parser.add_argument("--obstacles", type=int, default=1000, help="obstacles on the large synthetic track")
+    parser.add_argument("--scaling", action="store_true", help="time Track queries against obstacle count instead")
+    parser.add_argument("--counts", default="16,100,1000,5000", help="comma separated obstacle counts for --scaling")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.scaling:
+        counts = [int(count) for count in args.counts.split(",")]
+        print("%10s %14s %14s %14s %16s %16s" % ("obstacles", "linear us", "grid us", "segment us",
+                                                "ray linear us", "ray_cast us"))
+        for count, linear, grid, segment, ray_linear, ray_grid in bench_track_queries(counts, args.queries):
+            print("%10d %14.2f %14.2f %14.2f %16.1f %16.1f" % (count, linear*1e6, grid*1e6, segment*1e6,
+                                                             ray_linear*1e6, ray_grid*1e6))
+    else:
+        report = run_suite(args.seed, args.calls, args.obstacles)
+        if args.json is not None:
+            with open(args.json, "w") as out:
+                json.dump(report, out, indent=2, sort_keys=True)
+            print("saved " + args.json)
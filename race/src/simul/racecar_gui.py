@@ -5,6 +5,7 @@ import math
 import python_racecar
 import racecar_map
 import racecar_ai
+import racecar_sim
 import sys
 
 class RaceCarView:
@@ -32,6 +33,8 @@ class RaceCarView:
             dumb = False
 
         self.ai = racecar_ai.RacecarAI(self.car, self.screen, False, False)
+        self.sim = racecar_sim.Simulation(self.car, self.track, self.ai)
+        self.sim.observers.append(self.render)
         
         self.screen.grid(row = 0, column = 0, sticky = tkinter.NSEW)
 
@@ -42,20 +45,26 @@ class RaceCarView:
         self.window.bind('<space>', self.pause)
         self.window.bind('n', self.next_frame)
 
-    def _update(self):
-        self.screen.delete(tkinter.ALL)
-        self.car._update_pos() # update position of car based on physics
-        self.car.lidar_readings(self.track)
-        self.car.draw_lidar(self.screen)
+        ''' Canvas items are created once and moved with coords() every frame, only the
+        AI's debug lines (tagged "debug") are deleted and redrawn'''
+        self.lidar_item = self.car.draw_lidar(self.screen)
         self.draw_track()
-        self.draw_car()
         self.draw_nodes()
-        self.check_crash()
-        #AI program
-        self.ai.main_funct()
+        self.car_items = [self.screen.create_polygon(0, 0, 0, 0, outline = "#FFFFFF", fill = ""),
+                          self.screen.create_line(0, 0, 0, 0, fill = "#0066FF"),
+                          self.screen.create_line(0, 0, 0, 0, fill = "#0066FF")]
+
+    def _update(self):
+        self.screen.delete("debug")
+        self.sim.step() # physics, lidar and AI, drawn by render afterwards
         if(self.sim_running):
             self.screen.after(self.refresh_rate, self._update)
 
+    def render(self, sim:"Simulation"):
+        self.screen.coords(self.lidar_item, self.car.lidar_coords())
+        self.draw_car()
+        self.check_crash()
+
     def start(self):
         self._update()
         self.window.mainloop()
@@ -70,16 +79,8 @@ class RaceCarView:
     def next_frame(self, event:tkinter.Event):
         if self.sim_running:
             return
-        self.screen.delete(tkinter.ALL)
-        self.car._update_pos() # update position of car based on physics
-        self.car.lidar_readings(self.track)
-        self.car.draw_lidar(self.screen)
-        self.draw_track()
-        self.draw_car()
-        self.draw_nodes()
-        self.check_crash()
-        #AI program
-        self.ai.main_funct()
+        self.screen.delete("debug")
+        self.sim.step()
 
     def left_button_down(self, event:tkinter.Event):
         self.car.turnAngle -= 0.1
@@ -94,7 +95,7 @@ class RaceCarView:
         self.car.changeMotorSpeed(20)
 
     def check_crash(self):
-        if(self.track.check_collision(self.car._position)):
+        if(self.sim.crashed):
             self.sim_running = False
             print("FAILURE")
 
@@ -121,10 +122,9 @@ class RaceCarView:
         lowerLeftY = centerY + length*math.sin(self.car._angle - 5*angle)
         lowerRightX = centerX + length*math.cos(self.car._angle + 5*angle)
         lowerRightY = centerY + length*math.sin(self.car._angle + 5*angle)
-        self.screen.create_line(upperLeftX,upperLeftY,upperRightX,upperRightY, fill = "#FFFFFF")
-        self.screen.create_line(upperRightX,upperRightY,lowerRightX,lowerRightY, fill = "#FFFFFF")
-        self.screen.create_line(lowerRightX,lowerRightY,lowerLeftX,lowerLeftY, fill = "#FFFFFF")
-        self.screen.create_line(lowerLeftX,lowerLeftY,upperLeftX,upperLeftY, fill = "#FFFFFF")
+        frame, left_axil, right_axil = self.car_items
+        self.screen.coords(frame, upperLeftX,upperLeftY,upperRightX,upperRightY,
+                           lowerRightX,lowerRightY,lowerLeftX,lowerLeftY)
         # Front Axil
         leftX = upperLeftX + axil_length*math.cos(self.car._angle -
                                                   math.pi/2 + self.car.turnAngle)
@@ -134,8 +134,8 @@ class RaceCarView:
                                                     math.pi/2 + self.car.turnAngle)
         rightY = upperRightY + axil_length*math.sin(self.car._angle +
                                                     math.pi/2 + self.car.turnAngle)
-        self.screen.create_line(upperLeftX, upperLeftY, leftX, leftY, fill = "#0066FF")
-        self.screen.create_line(upperRightX, upperRightY, rightX, rightY, fill = "#0066FF")
+        self.screen.coords(left_axil, upperLeftX, upperLeftY, leftX, leftY)
+        self.screen.coords(right_axil, upperRightX, upperRightY, rightX, rightY)
         # dotted line
         
         '''update angle based on motorSpeed and turnAngle'''
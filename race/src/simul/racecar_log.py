@@ -0,0 +1,200 @@
+# binary record and replay of simulator runs, used to regression check driver changes without physics
+
+import argparse
+import json
+import numpy as np
+import python_racecar
+import racecar_ai
+import racecar_sim
+
+MAGIC = b"RCLOG1\n"
+STATE_SIZE = 8 # bytes for a driver state name: "auto", "left", "right" or "slow"
+KNOBS = ["speed_scale", "slowdown_distance", "steer_gain", "fricCoeff"]
+
+
+def log_dtype(beams, lidar_dtype=np.float32):
+    '''One record per step: what the driver saw (pose, velocity, controls, lidar, its own state)
+    and what it decided (controls and state afterwards).
+    Lidar defaults to float32, which is exact for the whole unit distances the tracks return.'''
+    return np.dtype([
+        ("step", np.int32),
+        ("x", np.float64), ("y", np.float64), ("angle", np.float64),
+        ("velocity", np.float64), ("motorSpeed", np.float64), ("turnAngle", np.float64),
+        ("lidar", lidar_dtype, (beams,)),
+        ("state", "S%d" % STATE_SIZE), ("collisionAvoid", np.bool_), ("safetyMode", np.bool_),
+        ("obsDist", np.float64), ("start_angle", np.float64), ("start_x", np.float64), ("start_y", np.float64),
+        ("next_index", np.int32), ("at_node", np.bool_),
+        # decision
+        ("out_motorSpeed", np.float64), ("out_turnAngle", np.float64), ("out_state", "S%d" % STATE_SIZE),
+        ("out_collisionAvoid", np.bool_), ("out_safetyMode", np.bool_),
+    ])
+
+DECISION_FIELDS = ["out_motorSpeed", "out_turnAngle", "out_state", "out_collisionAvoid", "out_safetyMode"]
+
+
+def _save_state(record, car, ai):
+    record["x"], record["y"] = car._position
+    record["angle"] = car._angle
+    record["velocity"] = car.velocity
+    record["motorSpeed"] = car.motorSpeed
+    record["turnAngle"] = car.turnAngle
+    record["lidar"] = car.lidar
+    record["state"] = ai.state.encode("ascii")
+    record["collisionAvoid"] = ai.collisionAvoid
+    record["safetyMode"] = ai.safetyMode
+    record["obsDist"] = ai.obsDist
+    record["start_angle"] = ai.start_angle
+    record["start_x"], record["start_y"] = ai.start_pos
+    if ai.codriver is not None:
+        record["next_index"] = ai.codriver.next_index
+        record["at_node"] = ai.codriver.at_node
+
+def _save_decision(record, car, ai):
+    record["out_motorSpeed"] = car.motorSpeed
+    record["out_turnAngle"] = car.turnAngle
+    record["out_state"] = ai.state.encode("ascii")
+    record["out_collisionAvoid"] = ai.collisionAvoid
+    record["out_safetyMode"] = ai.safetyMode
+
+def _load_state(record, car, ai):
+    car._position = (float(record["x"]), float(record["y"]))
+    car._angle = float(record["angle"])
+    car.velocity = float(record["velocity"])
+    car.motorSpeed = float(record["motorSpeed"])
+    car.turnAngle = float(record["turnAngle"])
+    car.lidar = record["lidar"].astype(np.float64)
+    ai.state = record["state"].decode("ascii")
+    ai.collisionAvoid = bool(record["collisionAvoid"])
+    ai.safetyMode = bool(record["safetyMode"])
+    ai.obsDist = float(record["obsDist"])
+    ai.start_angle = float(record["start_angle"])
+    ai.start_pos = (float(record["start_x"]), float(record["start_y"]))
+    if ai.codriver is not None:
+        ai.codriver.next_index = int(record["next_index"])
+        ai.codriver.at_node = bool(record["at_node"])
+
+
+class RunRecorder:
+    '''Records every step of a Simulation to a log file. Records are collected in a NumPy
+    structured array and appended to the file chunk records at a time.
+
+    The file is MAGIC, one line of JSON describing the run and the record dtype, then raw records.
+    '''
+
+    def __init__(self, path, sim:"Simulation", chunk=1024, lidar_dtype=np.float32):
+        self.sim = sim
+        self.dtype = log_dtype(len(sim.car.lidar), lidar_dtype)
+        self.buffer = np.zeros(chunk, dtype=self.dtype)
+        self.count = 0
+        self.file = open(path, "wb")
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "deltaTime": python_racecar.deltaTime,
+                  "codriver": sim.ai.codriver is not None, "dumb": sim.ai.dumb,
+                  "reading_number": sim.car.reading_number, "carLength": sim.car.carLength,
+                  "knobs": {name: getattr(sim.ai, name) for name in KNOBS}}
+        self.file.write(MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+        sim.before_ai.append(self.before_decision)
+        sim.observers.append(self.after_decision)
+
+    def before_decision(self, sim):
+        record = self.buffer[self.count]
+        record["step"] = sim.steps
+        _save_state(record, sim.car, sim.ai)
+
+    def after_decision(self, sim):
+        _save_decision(self.buffer[self.count], sim.car, sim.ai)
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.count].tobytes())
+        self.file.flush()
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.sim.before_ai.remove(self.before_decision)
+        self.sim.observers.remove(self.after_decision)
+
+
+def read_log(path):
+    '''Returns (header, records), records is a structured array memory mapped from the file'''
+    with open(path, "rb") as log:
+        if log.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a racecar log")
+        header = json.loads(log.readline().decode("utf-8"))
+        offset = log.tell()
+    dtype = np.lib.format.descr_to_dtype([tuple(field) for field in header["descr"]])
+    records = np.memmap(path, dtype=dtype, mode="r", offset=offset)
+    return header, records
+
+
+class ReplayResult:
+
+    def __init__(self, steps, first_diff, field, logged, replayed):
+        self.steps = steps # records checked
+        self.first_diff = first_diff # step number of the first differing decision, None if all matched
+        self.field = field # first field that differed
+        self.logged = logged
+        self.replayed = replayed
+
+    def __repr__(self):
+        if self.first_diff is None:
+            return "ReplayResult(%d steps, all decisions match)" % self.steps
+        return ("ReplayResult(first difference at step %d: %s logged %r, replayed %r)"
+                % (self.first_diff, self.field, self.logged, self.replayed))
+
+
+def replay(path, knobs=None):
+    '''Feeds every logged step back through RacecarAI.main_funct and compares its decision with
+    the log, stopping at the first difference. The car and driver state is restored from the
+    log before each step, so no physics is simulated.
+    knobs - optional {name: value} overriding the driver knobs stored in the log
+    '''
+    header, records = read_log(path)
+    python_racecar.deltaTime = header["deltaTime"]
+    car = python_racecar.Racecar(0, 0, 0)
+    car.reading_number = header["reading_number"]
+    car.carLength = header["carLength"]
+    ai = racecar_ai.RacecarAI(car, racecar_sim.NullScreen(), header["codriver"], header["dumb"])
+    settings = dict(header["knobs"])
+    settings.update(knobs or {})
+    for name, value in settings.items():
+        setattr(ai, name, value)
+
+    decision = np.zeros(1, dtype=records.dtype)[0]
+    for count, record in enumerate(records):
+        _load_state(record, car, ai)
+        ai.main_funct()
+        _save_decision(decision, car, ai)
+        for field in DECISION_FIELDS:
+            if decision[field] != record[field]:
+                return ReplayResult(count + 1, int(record["step"]), field, record[field].item(), decision[field].item())
+    return ReplayResult(len(records), None, None, None, None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record a headless simulator run or replay one against the driver")
+    sub = parser.add_subparsers(dest="command")
+    record = sub.add_parser("record", help="run the simulator and log every step")
+    record.add_argument("log")
+    record.add_argument("--max-steps", type=int, default=5000)
+    record.add_argument("--codriver", action="store_true")
+    record.add_argument("--dumb", action="store_true")
+    check = sub.add_parser("replay", help="re-run the driver on a log and report the first changed decision")
+    check.add_argument("log")
+    check.add_argument("--knob", action="append", default=[], metavar="NAME=VALUE", help="override a driver knob")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        sim = racecar_sim.make_simulation(codriver=args.codriver, dumb=args.dumb)
+        recorder = RunRecorder(args.log, sim)
+        result = sim.run(max_steps=args.max_steps)
+        recorder.close()
+        print(result)
+    elif args.command == "replay":
+        knobs = dict((name, float(value)) for name, value in (knob.split("=", 1) for knob in args.knob))
+        print(replay(args.log, knobs))
+    else:
+        parser.print_help()
@@ -1,8 +1,23 @@
 import tkinter
+import math
+import numpy as np
 
 class Track():
 
-    def __init__(self):
+    # ray_cast tests every ray against every obstacle up to this many obstacles, past it walking the
+    # grid cells along the rays is cheaper
+    ray_cast_all_obstacles = 64
+
+    def __init__(self, obstacles=None, cell_size=50):
+        # obstacles - list of Square, defaults to the built in course
+        # cell_size - side of the spatial index cells, roughly the size of a typical obstacle
+        self.cell_size = cell_size
+        if obstacles is None:
+            obstacles = self._default_obstacles()
+        self.obstacles = list(obstacles)
+        self._build_index()
+
+    def _default_obstacles(self):
         # (y1, y2, x1, x2)
         middle = Square(150,450,150,650)
         middle1 = Square(150,450,150,340)
@@ -24,9 +39,54 @@ class Track():
         block2 = Square(505,525,250,340)
         block3 = Square(560,580,250,340)
         
-        self.obstacles = [middle1, middle2, left_wall, right_wall, top_wall, bottom_wall, obstacle1,
-                         obstacle4, obstacle5, obstacle6, obstacle3, wall1, wall2, block1, block2, block3]
-        # self.obstacles = [middle1, middle2, left_wall, right_wall, top_wall, bottom_wall]
+        return [middle1, middle2, left_wall, right_wall, top_wall, bottom_wall, obstacle1,
+                obstacle4, obstacle5, obstacle6, obstacle3, wall1, wall2, block1, block2, block3]
+        # return [middle1, middle2, left_wall, right_wall, top_wall, bottom_wall]
+
+    def _build_index(self):
+        # inflated obstacle bounds as arrays so rays can be tested against every edge at once
+        margin = Square.margin
+        self._left = np.array([item.left - margin for item in self.obstacles], dtype=float)
+        self._right = np.array([item.right + margin for item in self.obstacles], dtype=float)
+        self._top = np.array([item.top - margin for item in self.obstacles], dtype=float)
+        self._bottom = np.array([item.bottom + margin for item in self.obstacles], dtype=float)
+
+        # uniform grid: every cell lists the obstacles whose inflated box overlaps it
+        self._cells = {}
+        for item in self.obstacles:
+            for cell in self._cells_between(item.left - margin, item.top - margin,
+                                            item.right + margin, item.bottom + margin):
+                self._cells.setdefault(cell, []).append(item)
+
+        # the same grid as flat arrays for ray_cast: the obstacle indices of the cell (cx, cy) are
+        # _cell_items[_cell_start[i]:_cell_start[i + 1]] with i = (cx - x0) * rows + (cy - y0)
+        index = dict((id(item), i) for i, item in enumerate(self.obstacles))
+        keys = np.array(list(self._cells) or [(0, 0)]).reshape(-1, 2)
+        self._grid_origin = keys.min(axis=0)
+        self._grid_shape = keys.max(axis=0) - self._grid_origin + 1
+        counts = np.zeros(self._grid_shape.prod(), dtype=int)
+        items = [[] for i in range(len(counts))]
+        for (cx, cy), cell in self._cells.items():
+            flat = (cx - self._grid_origin[0]) * self._grid_shape[1] + cy - self._grid_origin[1]
+            items[flat] = [index[id(item)] for item in cell]
+            counts[flat] = len(cell)
+        self._cell_start = np.concatenate([[0], np.cumsum(counts)])
+        self._cell_items = np.array([i for cell in items for i in cell], dtype=int)
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _cells_between(self, x1, y1, x2, y2):
+        # every cell key overlapping the box with corners (x1, y1) and (x2, y2)
+        left, top = self._cell(min(x1, x2), min(y1, y2))
+        right, bottom = self._cell(max(x1, x2), max(y1, y2))
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                yield (cx, cy)
+
+    def nearby(self, point:"touple"):
+        # obstacles that could contain point, taken from its grid cell
+        return self._cells.get(self._cell(point[0], point[1]), ())
 
     def draw(self, screen:"tkinter.Canvas"):
         color = "#FF0000"
@@ -34,14 +94,147 @@ class Track():
             screen.create_rectangle(item.left, item.top, item.right, item.bottom, outline = color)
 
     def check_collision(self, point:"touple"):
-        for item in self.obstacles:
+        for item in self.nearby(point):
             if item.intersect(point):
                 return True
         return False
 
+    def check_segment(self, start:"touple", end:"touple"):
+        # True if any point of the segment from start to end is inside an obstacle
+        checked = set()
+        for cell in self._cells_between(start[0], start[1], end[0], end[1]):
+            for item in self._cells.get(cell, ()):
+                if id(item) not in checked:
+                    checked.add(id(item))
+                    if item.intersect_segment(start, end):
+                        return True
+        return False
+
+    def check_collision_many(self, points:"numpy.ndarray"):
+        # check_collision for an array of points shaped (..., 2), returns a boolean array
+        points = np.asarray(points, dtype=float)
+        return self._inside(points[..., 0, np.newaxis], points[..., 1, np.newaxis]).any(axis=-1)
+
+    def ray_cast(self, origin:"touple", angles:"numpy.ndarray"):
+        '''Closed form equivalent of marching each ray outward one unit at a time until
+        check_collision is true. Returns the first whole ray length (starting at 1) that
+        lands inside an obstacle, for every angle at once.
+        origin - (x, y), or an array of shape (..., 2) for several rays origins
+        angles - ray angles, shape (..., beams) broadcastable against origin[..., 0]
+        Rays that never hit anything return inf.
+        '''
+        origin = np.asarray(origin, dtype=float)
+        angles = np.asarray(angles, dtype=float)
+        ox = origin[..., 0, np.newaxis]
+        oy = origin[..., 1, np.newaxis]
+        dx = np.cos(angles)
+        dy = np.sin(angles)
+        if len(self.obstacles) <= self.ray_cast_all_obstacles:
+            # shapes: (..., beams, 1) for the rays, (obstacles,) for boxes
+            n = np.newaxis
+            dist = self._first_steps(ox[..., n], oy[..., n], dx[..., n], dy[..., n],
+                                     self._left, self._right, self._top, self._bottom)
+            return dist.min(axis=-1)
+        ox, oy, dx, dy = np.broadcast_arrays(ox, oy, dx, dy)
+        return self._walk_grid(ox.ravel(), oy.ravel(), dx.ravel(), dy.ravel()).reshape(ox.shape)
+
+    def _first_steps(self, ox, oy, dx, dy, left, right, top, bottom):
+        # ray_cast of rays o + d*t against the boxes, broadcast against each other
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_lo, x_hi = self._slab(ox, dx, left, right)
+            y_lo, y_hi = self._slab(oy, dy, top, bottom)
+            t_lo = np.maximum(x_lo, y_lo)
+            t_hi = np.minimum(x_hi, y_hi)
+            # first whole step inside the slab overlap, the tiny offset absorbs rounding in t_lo
+            steps = np.maximum(np.ceil(t_lo - 1e-9), 1)
+            steps[~(steps <= t_hi + 1)] = np.inf
+            # confirm with the exact point test check_collision would do, rounding can push
+            # the true first step one further out
+            hit = self._in_box(ox + dx*steps, oy + dy*steps, left, right, top, bottom)
+            hit_next = self._in_box(ox + dx*(steps + 1), oy + dy*(steps + 1), left, right, top, bottom)
+        return np.where(hit, steps, np.where(hit_next, steps + 1, np.inf))
+
+    def _walk_grid(self, ox, oy, dx, dy):
+        # ray_cast of flat arrays of rays, visiting the grid cells along all rays together and testing
+        # each ray against the obstacles of its current cell only. A ray is done once its nearest hit
+        # is before the end of its cell, as an obstacle in a later cell can only be hit further out.
+        size = self.cell_size
+        dist = np.full(len(ox), np.inf)
+        if len(self._cell_items) == 0:
+            return dist
+        # only the part of the rays inside the box around every obstacle needs walking
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_lo, x_hi = self._slab(ox, dx, self._left.min(), self._right.max())
+            y_lo, y_hi = self._slab(oy, dy, self._top.min(), self._bottom.max())
+            start = np.maximum(np.maximum(x_lo, y_lo), 0)
+            end = np.minimum(x_hi, y_hi)
+            rays = np.flatnonzero(start <= end)
+            ox, oy, dx, dy, start, end = ox[rays], oy[rays], dx[rays], dy[rays], start[rays], end[rays]
+            low = self._grid_origin
+            high = self._grid_origin + self._grid_shape - 1
+            # the entry point can round into the cell past the box
+            cx = np.clip(np.floor((ox + dx*start) / size).astype(int), low[0], high[0])
+            cy = np.clip(np.floor((oy + dy*start) / size).astype(int), low[1], high[1])
+            step_x = np.where(dx > 0, 1, -1)
+            step_y = np.where(dy > 0, 1, -1)
+            # ray lengths at which the rays cross into the next column and row of cells
+            next_x = np.where(dx == 0, np.inf, ((cx + (dx > 0)) * size - ox) / dx)
+            next_y = np.where(dy == 0, np.inf, ((cy + (dy > 0)) * size - oy) / dy)
+            delta_x = np.abs(size / dx)
+            delta_y = np.abs(size / dy)
+        found = np.full(len(rays), np.inf)
+        while len(rays):
+            cell = (cx - low[0]) * self._grid_shape[1] + cy - low[1]
+            first = self._cell_start[cell]
+            counts = self._cell_start[cell + 1] - first
+            pair_ray = np.repeat(np.arange(len(rays)), counts)
+            if len(pair_ray):
+                skip = np.repeat(first - (np.cumsum(counts) - counts), counts)
+                items = self._cell_items[skip + np.arange(len(pair_ray))]
+                hits = self._first_steps(ox[pair_ray], oy[pair_ray], dx[pair_ray], dy[pair_ray], self._left[items],
+                                         self._right[items], self._top[items], self._bottom[items])
+                np.minimum.at(found, pair_ray, hits)
+            leave = np.minimum(next_x, next_y)
+            along_x = next_x < next_y
+            cx = cx + np.where(along_x, step_x, 0)
+            cy = cy + np.where(along_x, 0, step_y)
+            next_x = np.where(along_x, next_x + delta_x, next_x)
+            next_y = np.where(along_x, next_y, next_y + delta_y)
+            done = ((found <= leave) | (leave > end) | (cx < low[0]) | (cx > high[0])
+                    | (cy < low[1]) | (cy > high[1]))
+            dist[rays[done]] = found[done]
+            walking = ~done
+            rays, ox, oy, dx, dy, end = rays[walking], ox[walking], oy[walking], dx[walking], dy[walking], end[walking]
+            cx, cy, step_x, step_y = cx[walking], cy[walking], step_x[walking], step_y[walking]
+            next_x, next_y, delta_x, delta_y = next_x[walking], next_y[walking], delta_x[walking], delta_y[walking]
+            found = found[walking]
+        return dist
+
+    def _slab(self, o, d, low, high):
+        # range of ray lengths for which o + d*t lies in [low, high]
+        t1 = (low - o) / d
+        t2 = (high - o) / d
+        t_lo = np.minimum(t1, t2)
+        t_hi = np.maximum(t1, t2)
+        # rays parallel to the slab are either always or never inside it
+        parallel = (d == 0)
+        inside = (o >= low) & (o <= high)
+        t_lo = np.where(parallel, np.where(inside, -np.inf, np.inf), t_lo)
+        t_hi = np.where(parallel, np.where(inside, np.inf, -np.inf), t_hi)
+        return t_lo, t_hi
+
+    def _inside(self, x, y):
+        return self._in_box(x, y, self._left, self._right, self._top, self._bottom)
+
+    @staticmethod
+    def _in_box(x, y, left, right, top, bottom):
+        return (x <= right) & (x >= left) & (y >= top) & (y <= bottom)
+
 
 class Square():
 
+    margin = 5 # obstacles are treated as this much larger on every side
+
     def __init__(self, top:float, bottom:float, left:float, right:float):
         self.top = top
         self.bottom = bottom
@@ -49,7 +242,27 @@ class Square():
         self.right = right
 
     def intersect(self, point:"touple"):
-        if(point[0] <= self.right+5 and point[0] >= self.left-5 and point[1] >= self.top-5 and point[1] <= self.bottom+5):
+        margin = self.margin
+        if(point[0] <= self.right+margin and point[0] >= self.left-margin and point[1] >= self.top-margin and point[1] <= self.bottom+margin):
             return True
         else:
             return False
+
+    def intersect_segment(self, start:"touple", end:"touple"):
+        # clip the segment against the inflated box, it hits if any part of it is left
+        margin = self.margin
+        t_lo = 0.0
+        t_hi = 1.0
+        for o, d, low, high in ((start[0], end[0] - start[0], self.left - margin, self.right + margin),
+                                (start[1], end[1] - start[1], self.top - margin, self.bottom + margin)):
+            if d == 0:
+                if o < low or o > high:
+                    return False
+                continue
+            t1 = (low - o) / d
+            t2 = (high - o) / d
+            t_lo = max(t_lo, min(t1, t2))
+            t_hi = min(t_hi, max(t1, t2))
+            if t_lo > t_hi:
+                return False
+        return True
@@ -0,0 +1,170 @@
+# Track backed by a map_server occupancy grid (race/map/*.yaml) instead of hard coded rectangles
+
+import hashlib
+import math
+import os
+import tkinter
+import numpy as np
+import yaml
+from scipy import ndimage
+import racecar_map
+
+
+def read_image(path):
+    '''Reads a map image into a 2D uint8 array. PGM is parsed directly, anything else goes through PIL.'''
+    with open(path, "rb") as image:
+        data = image.read()
+    if data[:2] in (b"P5", b"P2"):
+        return _parse_pgm(data)
+    from PIL import Image
+    return np.asarray(Image.open(path).convert("L"))
+
+def _parse_pgm(data):
+    # header is magic, width, height and maxval separated by whitespace, with optional comments
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos:pos+1].isspace():
+            pos += 1
+        if data[pos:pos+1] == b"#":
+            pos = data.index(b"\n", pos) + 1
+            continue
+        end = pos
+        while not data[end:end+1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    magic, width, height, maxval = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+    if magic == b"P2":
+        pixels = np.array(data[pos:].split(), dtype=np.int64)[:width*height]
+    else:
+        pos += 1 # single whitespace before the raster
+        dtype = np.uint8 if maxval < 256 else np.dtype(">u2")
+        pixels = np.frombuffer(data, dtype=dtype, count=width*height, offset=pos)
+    pixels = pixels.reshape(height, width)
+    if maxval != 255:
+        pixels = pixels * 255 // maxval
+    return pixels.astype(np.uint8)
+
+
+class MapTrack():
+    '''Same interface as racecar_map.Track, but the obstacles come from a map_server YAML file.
+    World coordinates are image pixels, x to the right and y down like the GUI canvas, so one
+    unit is `resolution` metres. Cells that are not free (occupied or unknown) are obstacles,
+    grown by `margin` units like the squares of Track.
+
+    A Euclidean distance transform of the free space is computed once and cached next to the
+    map, and rays are sphere traced through it: every step moves as far as the nearest obstacle
+    allows, so a ray takes a handful of steps instead of one per unit.
+    '''
+
+    def __init__(self, yaml_path, margin=None, cache=True):
+        self.yaml_path = yaml_path
+        with open(yaml_path) as info:
+            self.info = yaml.safe_load(info)
+        self.resolution = float(self.info["resolution"])
+        self.origin = [float(value) for value in self.info["origin"]]
+        self.margin = racecar_map.Square.margin if margin is None else margin
+
+        image_path = self.info["image"]
+        if not os.path.isabs(image_path):
+            image_path = os.path.join(os.path.dirname(os.path.abspath(yaml_path)), image_path)
+        self.image_path = image_path
+        pixels = read_image(image_path)
+        self.height, self.width = pixels.shape
+
+        ''' Same thresholds map_server uses: p is the probability a cell is occupied'''
+        if int(self.info.get("negate", 0)):
+            occupancy = pixels / 255.0
+        else:
+            occupancy = (255 - pixels) / 255.0
+        self.free = occupancy < float(self.info["free_thresh"])
+
+        self.dist = self._load_distance_field(pixels, cache)
+        self.max_range = math.hypot(self.width, self.height)
+        self._photo = None
+
+    def _cache_key(self, pixels):
+        key = hashlib.sha1(pixels.tobytes())
+        key.update(repr((self.info.get("negate", 0), self.info["free_thresh"])).encode("utf-8"))
+        return key.hexdigest()
+
+    def _load_distance_field(self, pixels, cache):
+        '''Distance from every cell to the nearest non free cell, in cells. Stored next to the
+        image as <image>.edt.npz together with a hash of the image and thresholds, so an edited
+        map is never matched with a stale field.'''
+        cache_path = self.image_path + ".edt.npz"
+        key = self._cache_key(pixels)
+        if cache and os.path.exists(cache_path):
+            stored = np.load(cache_path)
+            if str(stored["key"]) == key:
+                return stored["dist"]
+        dist = ndimage.distance_transform_edt(self.free).astype(np.float32)
+        if cache:
+            try:
+                with open(cache_path, "wb") as out:
+                    np.savez(out, key=np.array(key), dist=dist)
+            except (IOError, OSError) as error:
+                print("could not cache distance field: " + str(error))
+        return dist
+
+    def from_metres(self, x, y):
+        # map frame position in metres to track coordinates (origin yaw is assumed to be 0)
+        return ((x - self.origin[0]) / self.resolution,
+                self.height - (y - self.origin[1]) / self.resolution)
+
+    def _clearance(self, x, y):
+        # distance left before the grown obstacles at each point, negative or zero means inside one
+        col = np.floor(x).astype(np.intp)
+        row = np.floor(y).astype(np.intp)
+        inside = (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+        clearance = np.full(np.shape(col), -1.0)
+        clearance[inside] = self.dist[row[inside], col[inside]] - self.margin
+        return clearance
+
+    def check_collision(self, point:"touple"):
+        return bool(self._clearance(np.asarray(point[0]), np.asarray(point[1])) <= 0)
+
+    def check_collision_many(self, points:"numpy.ndarray"):
+        points = np.asarray(points, dtype=float)
+        return self._clearance(points[..., 0], points[..., 1]) <= 0
+
+    def ray_cast(self, origin:"touple", angles:"numpy.ndarray", max_range=None):
+        '''Sphere traces rays from origin, shapes as Track.ray_cast. Gives the same whole ray
+        lengths as marching one unit at a time with check_collision. Rays that leave the map stop
+        at its edge and rays that travel further than max_range return inf.'''
+        if max_range is None:
+            max_range = self.max_range
+        origin = np.asarray(origin, dtype=float)
+        angles = np.asarray(angles, dtype=float)
+        ox = origin[..., 0, np.newaxis]
+        oy = origin[..., 1, np.newaxis]
+        dx = np.cos(angles)
+        dy = np.sin(angles)
+        shape = np.broadcast(ox, dx).shape
+        # flat copies of every ray, only the ones still travelling are touched in the loop
+        ox, oy, dx, dy = [np.broadcast_to(value, shape).ravel() for value in (ox, oy, dx, dy)]
+        dist = np.full(ox.shape, np.inf)
+        index = np.arange(ox.size)
+        t = np.ones(ox.size)
+        while index.size:
+            clearance = self._clearance(ox[index] + dx[index]*t, oy[index] + dy[index]*t)
+            hit = clearance <= 0
+            dist[index[hit]] = t[hit]
+            # the field is sampled at cell centres, so back off by a cell diagonal. Steps are whole
+            # units, so every point sampled is one the unit step marcher would sample too and the
+            # points skipped are all free
+            t = t + np.maximum(np.floor(clearance - 1.5), 1.0)
+            keep = ~hit & (t <= max_range)
+            index = index[keep]
+            t = t[keep]
+        return dist.reshape(shape)
+
+    def draw(self, screen:"tkinter.Canvas"):
+        # the map is drawn as one image, obstacles in red
+        if self._photo is None:
+            header = ("P6 %d %d 255\n" % (self.width, self.height)).encode("ascii")
+            rgb = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            rgb[~self.free, 0] = 255
+            self._photo = tkinter.PhotoImage(data=header + rgb.tobytes(), format="PPM")
+        screen.create_image(0, 0, image=self._photo, anchor=tkinter.NW)
@@ -0,0 +1,107 @@
+# precomputed (y, x, theta) lidar range table for a map, stored as a memory mapped .npy file
+
+import argparse
+import json
+import math
+import numpy as np
+import racecar_maptrack
+
+NO_RETURN = np.iinfo(np.uint16).max # stored for rays that never hit anything
+
+
+def build_range_table(yaml_path, out_path, spatial_step=2, angle_bins=360, margin=None, chunk_rows=16):
+    '''Ray casts every angle bin from a grid of positions over the map and writes the ranges in
+    millimetres as a uint16 array of shape (rows, cols, angle_bins). The array is written through
+    a memory map chunk_rows rows of positions at a time, so a large table never has to fit in RAM.
+    spatial_step - distance between table positions in map cells
+    angle_bins - number of headings, bin b is the angle 2*pi*b/angle_bins in track coordinates
+    Positions inside obstacles get a range of 0. Writes <out_path>.json with the table layout.
+    '''
+    track = racecar_maptrack.MapTrack(yaml_path, margin=margin)
+    cols = int(math.ceil(track.width / float(spatial_step)))
+    rows = int(math.ceil(track.height / float(spatial_step)))
+    to_mm = track.resolution * 1000.0
+    angles = np.arange(angle_bins) * (2*math.pi / angle_bins)
+
+    table = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.uint16, shape=(rows, cols, angle_bins))
+    for first in range(0, rows, chunk_rows):
+        last = min(first + chunk_rows, rows)
+        ys, xs = np.mgrid[first:last, 0:cols]
+        origins = np.stack([(xs + 0.5) * spatial_step, (ys + 0.5) * spatial_step], axis=-1)
+        free = ~track.check_collision_many(origins)
+        ranges = np.zeros((last - first, cols, angle_bins))
+        if free.any():
+            ranges[free] = track.ray_cast(origins[free], angles) * to_mm
+        no_return = np.isinf(ranges)
+        ranges[no_return] = 0
+        stored = np.minimum(np.round(ranges), NO_RETURN - 1).astype(np.uint16)
+        stored[no_return] = NO_RETURN
+        table[first:last] = stored
+    table.flush()
+    del table
+
+    layout = {"map": yaml_path, "resolution": track.resolution, "spatial_step": spatial_step,
+              "angle_bins": angle_bins, "width": track.width, "height": track.height, "margin": track.margin,
+              "units": "mm"}
+    with open(out_path + ".json", "w") as info:
+        json.dump(layout, info, indent=2)
+    return RangeTable(out_path)
+
+
+class RangeTable():
+    '''Read side of a table written by build_range_table. The array is opened memory mapped, so
+    only the pages a lookup touches are read from disk. Positions and angles are rounded to the
+    nearest table entry.'''
+
+    def __init__(self, path):
+        with open(path + ".json") as info:
+            self.layout = json.load(info)
+        self.table = np.load(path, mmap_mode="r")
+        self.rows, self.cols, self.angle_bins = self.table.shape
+        self.spatial_step = float(self.layout["spatial_step"])
+        self.resolution = float(self.layout["resolution"])
+        self.bin_width = 2*math.pi / self.angle_bins
+
+    def lookup_mm(self, origin, angles):
+        '''Ranges in millimetres for rays from origin (x, y) or (..., 2) at angles (..., beams), one gather'''
+        origin = np.asarray(origin, dtype=float)
+        angles = np.asarray(angles, dtype=float)
+        col = np.clip((origin[..., 0] / self.spatial_step).astype(np.intp), 0, self.cols - 1)[..., np.newaxis]
+        row = np.clip((origin[..., 1] / self.spatial_step).astype(np.intp), 0, self.rows - 1)[..., np.newaxis]
+        bins = np.round(angles / self.bin_width).astype(np.intp) % self.angle_bins
+        return self.table[row, col, bins]
+
+    def ray_cast(self, origin, angles):
+        # same units and shapes as Track.ray_cast so it can stand in for the ray caster
+        ranges = self.lookup_mm(origin, angles).astype(float)
+        dist = ranges / (self.resolution * 1000.0)
+        dist[ranges == NO_RETURN] = np.inf
+        return dist
+
+
+class RangeTableTrack():
+    '''A MapTrack whose lidar comes from a range table instead of ray casting'''
+
+    def __init__(self, track:"MapTrack", table:"RangeTable"):
+        self.track = track
+        self.table = table
+
+    def ray_cast(self, origin, angles):
+        return self.table.ray_cast(origin, angles)
+
+    def __getattr__(self, name):
+        return getattr(self.track, name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute a lidar range table for a race/map YAML")
+    parser.add_argument("map", help="map_server YAML file")
+    parser.add_argument("--out", default=None, help="table file, defaults to <map>.ranges.npy")
+    parser.add_argument("--step", type=float, default=2, help="spacing of table positions in map cells")
+    parser.add_argument("--angles", type=int, default=360, help="number of heading bins")
+    args = parser.parse_args()
+
+    out = args.out if args.out is not None else args.map + ".ranges.npy"
+    table = build_range_table(args.map, out, args.step, args.angles)
+    print("wrote %s: %d x %d positions, %d angles, %.1f MB" % (out, table.rows, table.cols, table.angle_bins,
+                                                                 table.table.nbytes / 1e6))
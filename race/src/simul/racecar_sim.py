@@ -0,0 +1,153 @@
+# headless simulation loop for the racecar, runs as fast as the CPU allows
+
+import argparse
+import math
+import time
+import python_racecar
+import racecar_map
+import racecar_ai
+
+
+def _ignore(*args, **kwargs):
+    pass
+
+class NullScreen:
+    '''Stands in for the tkinter canvas when there is no display. Every drawing call
+    the AI makes is accepted and ignored.'''
+
+    def __getattr__(self, name):
+        return _ignore
+
+
+class RunResult:
+
+    def __init__(self, crashed, steps, sim_time, wall_time, laps, lap_time):
+        self.crashed = crashed # True if the car hit an obstacle
+        self.steps = steps # physics steps taken
+        self.sim_time = sim_time # simulated seconds (steps * deltaTime)
+        self.wall_time = wall_time # real seconds spent in the loop
+        self.laps = laps # number of completed laps
+        self.lap_time = lap_time # simulated seconds to finish the first lap, None if no lap was finished
+
+    @property
+    def success(self):
+        return not self.crashed
+
+    @property
+    def steps_per_sec(self):
+        if self.wall_time <= 0:
+            return float("inf")
+        return self.steps / self.wall_time
+
+    def __repr__(self):
+        return ("RunResult(crashed=%s, steps=%d, sim_time=%.2f, laps=%d, lap_time=%s, steps_per_sec=%.1f)"
+                % (self.crashed, self.steps, self.sim_time, self.laps, self.lap_time, self.steps_per_sec))
+
+
+class Simulation:
+    '''Physics loop for one car, one track and one driver, with nothing drawn.
+    Observers are called as observer(sim) after every step, which is how the GUI
+    renders without being part of the loop. before_ai callbacks are called the same
+    way after the physics and lidar update, right before the driver decides.
+    '''
+
+    def __init__(self, car:"Racecar", track:"Track", ai:"RacecarAI", lap_radius=40, lap_depart=200):
+        self.car = car
+        self.track = track
+        self.ai = ai
+        self.observers = []
+        self.before_ai = []
+        self.steps = 0
+        self.crashed = False
+
+        ''' A lap is counted when the car gets lap_depart away from its start and then comes back within lap_radius'''
+        self.lap_radius = lap_radius
+        self.lap_depart = lap_depart
+        self.start_pos = car._position
+        self.departed = False
+        self.laps = 0
+        self.lap_time = None
+
+    def step(self):
+        self.car._update_pos() # update position of car based on physics
+        self.car.lidar_readings(self.track)
+        self.crashed = self.track.check_collision(self.car._position)
+        self._check_lap()
+        for callback in self.before_ai:
+            callback(self)
+        #AI program
+        self.ai.main_funct()
+        self.steps += 1
+        for observer in self.observers:
+            observer(self)
+        return self.crashed
+
+    def _check_lap(self):
+        dist = racecar_ai.dist_between(self.car._position, self.start_pos)
+        if not self.departed:
+            self.departed = dist > self.lap_depart
+        elif dist < self.lap_radius:
+            self.departed = False
+            self.laps += 1
+            if self.lap_time is None:
+                self.lap_time = self.steps * python_racecar.deltaTime
+
+    def run(self, max_steps=None, max_time=None, stop_on_lap=False):
+        '''Steps until the car crashes or a limit is reached. max_time is in simulated seconds.'''
+        if max_steps is None and max_time is None and not stop_on_lap:
+            raise ValueError("run needs max_steps, max_time or stop_on_lap, otherwise it may never end")
+        start_steps = self.steps
+        start = time.perf_counter()
+        while not self.crashed:
+            if max_steps is not None and self.steps - start_steps >= max_steps:
+                break
+            if max_time is not None and (self.steps - start_steps) * python_racecar.deltaTime >= max_time:
+                break
+            if stop_on_lap and self.laps > 0:
+                break
+            self.step()
+        wall_time = time.perf_counter() - start
+        steps = self.steps - start_steps
+        return RunResult(self.crashed, steps, steps * python_racecar.deltaTime, wall_time, self.laps, self.lap_time)
+
+
+def make_simulation(x=75, y=300, angle=math.pi/2, codriver=False, dumb=False, screen=None, track=None):
+    '''Builds the default car, track and driver used by the GUI. Without a screen the driver draws nowhere.'''
+    car = python_racecar.Racecar(x, y, angle)
+    if track is None:
+        track = racecar_map.Track()
+    if screen is None:
+        screen = NullScreen()
+    ai = racecar_ai.RacecarAI(car, screen, codriver, dumb)
+    return Simulation(car, track, ai)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the racecar simulator without a display")
+    parser.add_argument("--max-steps", type=int, default=None, help="stop after this many physics steps")
+    parser.add_argument("--max-time", type=float, default=None, help="stop after this many simulated seconds")
+    parser.add_argument("--lap", action="store_true", help="stop after the first completed lap")
+    parser.add_argument("--dt", type=float, default=python_racecar.deltaTime, help="physics step in seconds")
+    parser.add_argument("--codriver", action="store_true")
+    parser.add_argument("--dumb", action="store_true")
+    parser.add_argument("--map", default=None, help="map_server YAML file (race/map/*.yaml) to drive on")
+    parser.add_argument("--start", default=None, help="start pose x,y,angle in track units")
+    args = parser.parse_args()
+    if args.max_steps is None and args.max_time is None and not args.lap:
+        args.max_steps = 5000
+
+    python_racecar.deltaTime = args.dt
+    track = None
+    if args.map is not None:
+        import racecar_maptrack
+        track = racecar_maptrack.MapTrack(args.map)
+    pose = (75, 300, math.pi/2)
+    if args.start is not None:
+        pose = [float(value) for value in args.start.split(",")]
+    sim = make_simulation(pose[0], pose[1], pose[2], codriver=args.codriver, dumb=args.dumb, track=track)
+    result = sim.run(max_steps=args.max_steps, max_time=args.max_time, stop_on_lap=args.lap)
+    if result.crashed:
+        print("FAILURE")
+    else:
+        print("SUCCESS")
+    print(result)
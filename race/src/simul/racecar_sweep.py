@@ -0,0 +1,169 @@
+# parameter sweep over the driver tuning knobs, one headless lap per trial, spread over all cores
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import racecar_sim
+
+''' Knobs that can be swept and where they live in the simulation. speed_scale, slowdown_distance
+and steer_gain are on the simulator's driver, see racecar_ai.RacecarAI, carLength is on the car and
+changes both the driver and the physics.'''
+KNOBS = {
+    "speed_scale": lambda sim, value: setattr(sim.ai, "speed_scale", value),
+    "slowdown_distance": lambda sim, value: setattr(sim.ai, "slowdown_distance", value),
+    "steer_gain": lambda sim, value: setattr(sim.ai, "steer_gain", value),
+    "carLength": lambda sim, value: setattr(sim.car, "carLength", value),
+}
+
+COLUMNS = ["hash"] + sorted(KNOBS) + ["trials", "max_steps", "crash_rate", "lap_time", "min_clearance"]
+
+
+def param_hash(params, trials=4, max_steps=3000):
+    # stable key for a parameter set and the laps it is run for, used to cache results between runs
+    text = json.dumps([sorted(params.items()), trials, max_steps])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def grid(space):
+    '''space - {knob: [values]}, returns every combination as a list of dicts'''
+    combos = [{}]
+    for name in sorted(space):
+        combos = [dict(combo, **{name: value}) for combo in combos for value in space[name]]
+    return combos
+
+def random_search(space, count, seed=0):
+    '''space - {knob: (low, high)}, returns count parameter sets drawn uniformly'''
+    rng = random.Random(seed)
+    return [{name: rng.uniform(*space[name]) for name in sorted(space)} for i in range(count)]
+
+
+class ClearanceTracker:
+    # simulation observer that remembers the shortest lidar reading seen
+    def __init__(self):
+        self.min_clearance = float("inf")
+
+    def __call__(self, sim):
+        self.min_clearance = min(self.min_clearance, float(min(sim.car.lidar)))
+
+
+def evaluate(params, trials=4, max_steps=3000):
+    '''Runs the driver with params from slightly different start poses, each trial lasting
+    until the first lap, a crash or max_steps. Start poses are seeded by the parameter hash
+    so the same parameters always give the same result.
+    '''
+    key = param_hash(params, trials, max_steps)
+    rng = random.Random(param_hash(params)) # the same start poses whatever the number of trials
+    crashes = 0
+    lap_times = []
+    min_clearance = float("inf")
+    for trial in range(trials):
+        sim = racecar_sim.make_simulation(75 + rng.uniform(-5, 5), 300 + rng.uniform(-5, 5),
+                                          math.pi/2 + rng.uniform(-0.05, 0.05))
+        for name, value in params.items():
+            KNOBS[name](sim, value)
+        tracker = ClearanceTracker()
+        sim.observers.append(tracker)
+        result = sim.run(max_steps=max_steps, stop_on_lap=True)
+        if result.crashed:
+            crashes += 1
+        elif result.lap_time is not None:
+            lap_times.append(result.lap_time)
+        min_clearance = min(min_clearance, tracker.min_clearance)
+
+    row = {"hash": key, "trials": trials, "max_steps": max_steps, "crash_rate": crashes / trials,
+           "min_clearance": min_clearance, "lap_time": sum(lap_times) / len(lap_times) if lap_times else None}
+    row.update(params)
+    return row
+
+def _evaluate_job(job):
+    params, trials, max_steps = job
+    return evaluate(params, trials, max_steps)
+
+
+def load_cache(path):
+    # finished results keyed by param_hash, one JSON object per line
+    results = {}
+    if os.path.exists(path):
+        with open(path) as cache:
+            for line in cache:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    results[row["hash"]] = row
+    return results
+
+def run_sweep(param_sets, cache_path, processes=None, trials=4, max_steps=3000):
+    '''Evaluates every parameter set not already in the cache on a process pool. Each result is
+    appended to the cache as soon as it arrives, so an interrupted sweep picks up where it stopped.
+    Returns the results for param_sets in the order given.
+    '''
+    results = load_cache(cache_path)
+    todo = []
+    queued = set(results)
+    for params in param_sets:
+        key = param_hash(params, trials, max_steps)
+        if key not in queued:
+            queued.add(key)
+            todo.append((params, trials, max_steps))
+    print("%d parameter sets, %d cached, %d to run" % (len(param_sets), len(param_sets) - len(todo), len(todo)))
+
+    if todo:
+        pool = multiprocessing.Pool(processes)
+        try:
+            with open(cache_path, "a") as cache:
+                for done, row in enumerate(pool.imap_unordered(_evaluate_job, todo), 1):
+                    cache.write(json.dumps(row) + "\n")
+                    cache.flush()
+                    results[row["hash"]] = row
+                    print("[%d/%d] %s" % (done, len(todo), row))
+        finally:
+            pool.terminate()
+            pool.join()
+    return [results[param_hash(params, trials, max_steps)] for params in param_sets]
+
+def write_table(rows, path):
+    with open(path, "w", newline="") as table:
+        writer = csv.DictWriter(table, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+def _parse_space(specs, ranges):
+    # "name=1,2,3" for a grid, "name=low:high" for a random search
+    space = {}
+    for spec in specs:
+        name, values = spec.split("=", 1)
+        if name not in KNOBS:
+            raise SystemExit("unknown knob %r, choose from %s" % (name, ", ".join(sorted(KNOBS))))
+        if ranges:
+            low, high = values.split(":")
+            space[name] = (float(low), float(high))
+        else:
+            space[name] = [float(value) for value in values.split(",")]
+    return space
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep driver tuning knobs over headless simulated laps")
+    parser.add_argument("knobs", nargs="+", help="name=v1,v2,... for a grid or name=low:high with --random")
+    parser.add_argument("--random", type=int, default=0, metavar="N", help="draw N random parameter sets instead of a grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trials", type=int, default=4, help="laps per parameter set")
+    parser.add_argument("--max-steps", type=int, default=3000, help="step limit for each lap")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, defaults to every core")
+    parser.add_argument("--cache", default="sweep_cache.jsonl")
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    space = _parse_space(args.knobs, args.random > 0)
+    if args.random > 0:
+        param_sets = random_search(space, args.random, args.seed)
+    else:
+        param_sets = grid(space)
+    rows = run_sweep(param_sets, args.cache, args.processes, args.trials, args.max_steps)
+    write_table(rows, args.out)
+    print("wrote %d rows to %s" % (len(rows), args.out))
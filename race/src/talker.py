@@ -4,9 +4,12 @@ import rospy
 from race.msg import drive_values
 from race.msg import drive_param
 from std_msgs.msg import Bool
+import latency_stats
 
 pub = rospy.Publisher('drive_pwm', drive_values, queue_size=10)
 em_pub = rospy.Publisher('eStop', Bool, queue_size=10)
+latency = latency_stats.LatencyReporter('serial_talker')
+scan_latency = latency.stage('scan_to_drive_pwm')
 
 # function to map from one range to another, similar to arduino
 def arduino_map(x, in_min, in_max, out_min, out_max):
@@ -26,11 +29,14 @@ def callback(data):
     print("message is : ",msg)
     print("pwm1: ",msg.pwm_drive,"pwm2: ",msg.pwm_angle)
     pub.publish(msg)
+    if latency_stats.is_set(data.stamp): # keyboard commands carry no scan stamp
+        scan_latency.record(rospy.get_time() - data.stamp.to_sec())
 
 def talker():
     rospy.init_node('serial_talker', anonymous=True)
     em_pub.publish(False)
     rospy.Subscriber("drive_parameters", drive_param, callback)
+    latency.start()
     
     rospy.spin()
 
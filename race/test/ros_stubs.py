@@ -0,0 +1,152 @@
+# Stand-ins for the ROS python modules the nodes import, so their logic can be tested without a ROS install.
+# install() only fills in the modules that cannot be imported, a sourced ROS workspace is used as is.
+# The nodes are then built with publisher= and params= like the offline replay does.
+
+import copy
+import sys
+import time
+import types
+
+
+class Message(object):
+    # message with the fields of a .msg file, set positionally or by keyword like genpy messages
+    __slots__ = ()
+    defaults = ()
+
+    def __init__(self, *args, **kwargs):
+        for (name, default), value in zip(self.defaults, args):
+            kwargs.setdefault(name, value)
+        for name, default in self.defaults:
+            setattr(self, name, kwargs.pop(name, default() if callable(default) else default))
+        if kwargs:
+            raise TypeError("unknown fields %s" % sorted(kwargs))
+
+
+def message(name, *defaults):
+    return type(name, (Message,), {'__slots__': [field for field, _ in defaults], 'defaults': defaults})
+
+
+class Publisher(object):
+    # keeps copies of what was published in sent, the nodes reuse their messages
+    def __init__(self, name, data_class, queue_size=None, **kwargs):
+        self.name = name
+        self.resolved_name = resolve_name(name)
+        self.data_class = data_class
+        self.sent = []
+
+    def publish(self, msg):
+        self.sent.append(copy.deepcopy(msg))
+
+
+class Publishers(dict):
+    # publisher= argument of the nodes, keeps the Publisher of every topic
+    def __call__(self, name, data_class, **kwargs):
+        self[name] = Publisher(name, data_class, **kwargs)
+        return self[name]
+
+
+class ROSInterruptException(Exception):
+    pass
+
+
+class Time(object):
+    def __init__(self, secs=0, nsecs=0):
+        self.secs = secs
+        self.nsecs = nsecs
+
+    @classmethod
+    def from_sec(cls, seconds):
+        return cls(int(seconds), int(round((seconds - int(seconds))*1e9)))
+
+    @classmethod
+    def now(cls):
+        return cls.from_sec(time.time())
+
+    def to_sec(self):
+        return self.secs + 1e-9*self.nsecs
+
+
+def resolve_name(name):
+    return name if name.startswith('/') else '/' + name
+
+
+def _rospy():
+    rospy = types.ModuleType('rospy')
+    rospy.Publisher = Publisher
+    rospy.Subscriber = lambda *args, **kwargs: None
+    rospy.Timer = lambda *args, **kwargs: None
+    rospy.Duration = lambda seconds: seconds
+    rospy.Time = Time
+    rospy.ROSInterruptException = ROSInterruptException
+    rospy.get_time = time.time
+    rospy.get_param = lambda name, default=None: default
+    rospy.get_name = lambda: '/test'
+    rospy.resolve_name = resolve_name
+    rospy.is_shutdown = lambda: True
+    rospy.logged = [] # (level, text) of every log call
+    for level in ('logdebug', 'loginfo', 'logwarn', 'logerr', 'logfatal'):
+        log = (lambda level: lambda text, *args: rospy.logged.append((level, text % args if args else text)))(level)
+        setattr(rospy, level, log)
+        setattr(rospy, level + '_throttle', (lambda log: lambda period, text, *args: log(text, *args))(log))
+    numpy_msg = types.ModuleType('rospy.numpy_msg')
+    numpy_msg.numpy_msg = lambda data_class: data_class
+    rospy.numpy_msg = numpy_msg
+    return {'rospy': rospy, 'rospy.numpy_msg': numpy_msg}
+
+
+def _msgs():
+    Header = message('Header', ('seq', 0), ('stamp', Time), ('frame_id', ''))
+    race = {
+        'drive_param': message('drive_param', ('velocity', 0.0), ('angle', 0.0), ('stamp', Time)),
+        'driver_telemetry': message('driver_telemetry', ('stamp', Time), ('velocity', 0.0), ('angle', 0.0),
+                                    ('front_dist', 0.0), ('obstacle_dist', 0.0), ('state', ''), ('alert', ''),
+                                    ('collision_avoid', False), ('safety_mode', False), ('motor_kill', False),
+                                    ('scans', 0), ('scans_dropped', 0), ('overruns', 0)),
+        'pid_input': message('pid_input', ('pid_vel', 0.0), ('pid_error', 0.0), ('stamp', Time)),
+        'scan_features': message('scan_features', ('header', Header), ('left_alpha', 0.0), ('left_dist', 0.0),
+                                 ('right_alpha', 0.0), ('right_dist', 0.0), ('corridor_width', 0.0),
+                                 ('front_thresholds', list), ('front_fraction', list), ('nearest_dist', 0.0),
+                                 ('nearest_bearing', 0.0)),
+    }
+    std = dict((name, message(name, ('data', None))) for name in ('Bool', 'String', 'Float32', 'Int32'))
+    std['Header'] = Header
+    sensor = {
+        'LaserScan': message('LaserScan', ('header', Header), ('angle_min', 0.0), ('angle_max', 0.0),
+                             ('angle_increment', 0.0), ('time_increment', 0.0), ('scan_time', 0.0),
+                             ('range_min', 0.0), ('range_max', 0.0), ('ranges', list), ('intensities', list)),
+    }
+    status = message('DiagnosticStatus', ('level', 0), ('name', ''), ('message', ''), ('hardware_id', ''),
+                     ('values', list))
+    status.OK, status.WARN, status.ERROR, status.STALE = 0, 1, 2, 3
+    diagnostic = {
+        'DiagnosticArray': message('DiagnosticArray', ('header', Header), ('status', list)),
+        'DiagnosticStatus': status,
+        'KeyValue': message('KeyValue', ('key', ''), ('value', '')),
+    }
+    return {'race': race, 'std_msgs': std, 'sensor_msgs': sensor, 'diagnostic_msgs': diagnostic}
+
+
+def _importable(name, attribute):
+    # a checkout of the package can make race.msg importable as the directory of .msg files, without the classes
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return hasattr(sys.modules[name], attribute)
+
+
+def install():
+    if not _importable('rospy', 'Publisher'):
+        sys.modules.update(_rospy())
+    for package, classes in _msgs().items():
+        name = package + '.msg'
+        if _importable(name, sorted(classes)[0]):
+            continue
+        msg = types.ModuleType(name)
+        for class_name, cls in classes.items():
+            cls.__module__ = name
+            setattr(msg, class_name, cls)
+        if package not in sys.modules:
+            sys.modules[package] = types.ModuleType(package)
+        sys.modules[package].msg = msg
+        sys.modules[name] = msg
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# the driver node's scan hand off and control cycle, run without ROS
+
+import math
+import os
+import sys
+import time
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import ros_stubs
+ros_stubs.install()
+import driver_ai
+import scan_replay
+
+
+def make_scan(seq, ranges=None):
+    if ranges is None:
+        ranges = numpy.full(1081, 8.0, dtype=numpy.float32)
+    return scan_replay.RecordedScan(seq, seq / 40.0, -3*math.pi/4, math.radians(0.25), ranges)
+
+
+def make_driver(**params):
+    clock = scan_replay.Clock()
+    publishers = ros_stubs.Publishers()
+    ai = driver_ai.RacecarAI(driver_ai.Car(clock=clock), False, False, publisher=publishers,
+                             subscribe=False, params=params)
+    return ai, clock, publishers
+
+
+class TestScanMailbox(unittest.TestCase):
+
+    def test_unread_scan_is_replaced_and_counted(self):
+        mailbox = driver_ai.ScanMailbox()
+        self.assertIsNone(mailbox.take())
+        mailbox.put("first")
+        mailbox.put("second")
+        self.assertEqual("second", mailbox.take())
+        self.assertIsNone(mailbox.take())
+        mailbox.put("third")
+        self.assertEqual("third", mailbox.take())
+        self.assertEqual(3, mailbox.received)
+        self.assertEqual(1, mailbox.dropped)
+
+
+class TestControlCycle(unittest.TestCase):
+
+    def test_overruns_count_cycles_longer_than_the_period(self):
+        ai, clock, publishers = make_driver()
+        processed = []
+
+        def process_scan(scan, duration):
+            time.sleep(duration)
+            processed.append(scan.header.seq)
+
+        period = 0.05
+        ai.control_cycle(period) # nothing to take
+        for seq, duration in enumerate([0.0, 2*period, 0.0, 2*period]):
+            ai.process_scan = lambda scan: process_scan(scan, duration)
+            ai.update_lidar(make_scan(seq))
+            ai.control_cycle(period)
+        self.assertEqual([0, 1, 2, 3], processed)
+        self.assertEqual(2, ai.overruns)
+
+    def test_failed_cycle_stops_the_car_and_the_next_one_runs(self):
+        ai, clock, publishers = make_driver()
+        ai.update_lidar(make_scan(0))
+        ai.control_cycle(1.0)
+        self.assertNotEqual(0, publishers['drive_parameters'].sent[-1].velocity)
+
+        def process_scan(scan):
+            raise ValueError("bad scan")
+        ai.process_scan = process_scan
+        ai.update_lidar(make_scan(1))
+        ai.control_cycle(1.0)
+        del ai.process_scan
+        stop = publishers['drive_parameters'].sent[-1]
+        self.assertEqual((0, 8), (stop.velocity, stop.angle))
+
+        ai.update_lidar(make_scan(2))
+        ai.control_cycle(1.0)
+        self.assertEqual(2, ai.scan_number)
+        self.assertNotEqual(0, publishers['drive_parameters'].sent[-1].velocity)
+
+
+class TestOutputs(unittest.TestCase):
+
+    def test_wall_decision_is_published_as_the_alert(self):
+        ai, clock, publishers = make_driver()
+        ai.process_scan(make_scan(0))
+        self.assertEqual("none", publishers['alert'].sent[-1].data)
+
+        ranges = numpy.full(1081, 8.0, dtype=numpy.float32)
+        ranges[860:941] = 0.3 # left wall, 80 to 100 degrees, closer than a car length
+        clock.now = 1.0 # past the telemetry period
+        ai.process_scan(make_scan(1, ranges))
+        self.assertEqual("left", publishers['alert'].sent[-1].data)
+        self.assertEqual("left", ai.telemetry_msg.alert)
+
+    def test_telemetry_is_published_every_nth_cycle(self):
+        ai, clock, publishers = make_driver(telemetry_rate=4.0)
+        for seq in range(40):
+            clock.now = seq / 32.0 # 32 cycles a second, telemetry every 8th
+            ai.process_scan(make_scan(seq))
+        self.assertEqual(40, len(publishers['drive_parameters'].sent))
+        telemetry = publishers['driver_telemetry'].sent
+        self.assertEqual([seq / 40.0 for seq in range(0, 40, 8)], [msg.stamp for msg in telemetry])
+        self.assertEqual([8*i + 1 for i in range(5)], [msg.scans for msg in telemetry])
+
+
+class TestScanFeatures(unittest.TestCase):
+
+    def test_features_are_computed_at_most_once_per_scan(self):
+        ai, clock, publishers = make_driver(telemetry_rate=40.0)
+        modes = set()
+        for seq in range(60):
+            # an obstacle ahead in every other block of 10 scans, so the car avoids it and drives on
+            ranges = numpy.full(1081, 8.0, dtype=numpy.float32)
+            if seq % 20 < 10:
+                ranges[500:580] = 1.0
+            clock.now = seq / 40.0
+            ai.process_scan(make_scan(seq, ranges))
+            modes.add(ai.collisionAvoid)
+        self.assertEqual({False, True}, modes)
+        features = ai.features
+        self.assertEqual(60, features.scans)
+        self.assertEqual(60, features.computed["front_dist"]) # read by every decision and the telemetry
+        self.assertGreater(features.computed["gaps"], 0)
+        for name in ("front_dist", "front_angle", "side_averages", "wall_slopes", "gaps"):
+            self.assertLessEqual(features.computed[name], features.scans, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# the driver's control cycle must not keep allocating memory once it is warmed up
+
+import gc
+import math
+import os
+import sys
+import unittest
+import numpy
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, SRC)
+import ros_stubs
+ros_stubs.install()
+import driver_ai
+import scan_replay
+
+try:
+    import tracemalloc
+except ImportError: # python 2
+    tracemalloc = None
+
+
+def make_scans(count, beams=1081):
+    # blocks of 10 scans with an obstacle ahead followed by 10 of open hallway, so both driver modes
+    # run and the driver is back in auto at the end of every block
+    rng = numpy.random.RandomState(0)
+    scans = []
+    for seq in range(count):
+        ranges = rng.uniform(5.0, 10.0, beams).astype(numpy.float32)
+        if seq % 20 < 10:
+            ranges[500:580] = 1.0
+        scans.append(scan_replay.RecordedScan(seq, seq / 40.0, -3*math.pi/4, math.radians(0.25), ranges))
+    return scans
+
+
+@unittest.skipIf(tracemalloc is None, "tracemalloc needs python 3")
+class TestDriverAllocations(unittest.TestCase):
+
+    def test_steady_state_cycle_keeps_no_memory(self):
+        clock = scan_replay.Clock()
+        outputs = scan_replay.Outputs()
+        ai = driver_ai.RacecarAI(driver_ai.Car(clock=clock), False, False, publisher=outputs.publisher,
+                                 subscribe=False, params={})
+        scans = make_scans(600)
+
+        def cycle(scan):
+            clock.now = scan.header.stamp
+            ai.process_scan(scan)
+
+        tracemalloc.start()
+        try:
+            # warm up while tracing, so what the last cycle keeps alive is in both snapshots, and past
+            # 256 scans, so the feature counters are no longer cached small ints
+            for scan in scans[:300]:
+                cycle(scan)
+            gc.collect()
+            before = tracemalloc.take_snapshot()
+            for scan in scans[300:]:
+                cycle(scan)
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        kept = [stat for stat in after.compare_to(before, "lineno")
+                if stat.size_diff > 0 and os.path.abspath(stat.traceback[0].filename).startswith(SRC)]
+        self.assertEqual([], kept)
+
+
+if __name__ == '__main__':
+    unittest.main()
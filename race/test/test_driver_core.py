@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# driver_core must decide what the per beam loops of driver_ai.RacecarAI decided, copied below from
+# the driver before Car.lidar became an array and before its decisions moved to driver_core. On purpose
+# decide grows the obstacles by half the car width when looking for a gap, keeps the angle when there is
+# no gap and looks ahead at the avoiding speed even when the motors are killed, TestDecide checks those
+
+import math
+import os
+import sys
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import driver_core
+
+
+def average(array):
+    total = 0
+    for value in array:
+        total += value
+    return total / len(array)
+
+def _getFrontDist(lidar, carLength, angle=0):
+    middle = len(lidar)//2
+    # relative angle ranges from -pi/2 to pi/2
+    lidar_beam_angle = (math.pi / len(lidar))
+    #determine the range of values to scan
+    scope = int(math.atan(1) / lidar_beam_angle) + 1
+    # this converts relative angle to corresponding LIDAR index
+    index = int(angle / lidar_beam_angle + middle)
+
+    front_dist = lidar[index]
+    for i in range(-scope,scope+1):
+        if(lidar[index+i]*math.sin(abs(i)*lidar_beam_angle) < carLength/2):
+            if(lidar[index+i] < front_dist):
+                front_dist = lidar[index+i]
+    return front_dist
+
+def _getFrontAngle(lidar, carLength, angle=0):
+    middle = len(lidar)//2
+    # relative angle ranges from -pi/2 to pi/2
+    lidar_beam_angle = (math.pi / len(lidar))
+    #determine the range of values to scan
+    scope = int(math.atan(1) / lidar_beam_angle) + 1
+    # this converts relative angle to corresponding LIDAR index
+    index = int(angle / lidar_beam_angle + middle)
+    slopes = []
+
+    for i in range(-scope,scope+1):
+        if(lidar[index+i]*math.sin(abs(i)*lidar_beam_angle) < carLength/2):
+            # average of slopes between left and right lidar readings
+            x1 = lidar[index+i] * math.cos(lidar_beam_angle)
+            y1 = lidar[index+i] * math.sin(lidar_beam_angle)
+            x2 = lidar[index+i+1] * math.cos(2*lidar_beam_angle)
+            y2 = lidar[index+i+1] * math.sin(2*lidar_beam_angle)
+            slopes.append( math.atan2((y2-y1) , (x2-x1)) )
+    return average(slopes)
+
+def side_averages(lidar, reading_number):
+    # the wall check of _moveAwayFromWall
+    left = average(lidar[0:5*reading_number])
+    right = average(lidar[-5*reading_number:len(lidar)])
+    return left, right
+
+def wall_slopes(lidar):
+    # the slope loop of autoProgram
+    angle = math.pi / (len(lidar)-1)
+    left_slopes = []
+    right_slopes = []
+    # average of slopes between left and right lidar readings
+    for i in range(5):
+        left_x1 = lidar[i+1] * math.cos(angle)
+        left_y1 = lidar[i+1] * math.sin(angle)
+        left_x2 = lidar[i+2] * math.cos(2*angle)
+        left_y2 = lidar[i+2] * math.sin(2*angle)
+        left_slopes.append( math.atan2((left_y2-left_y1) , (left_x2-left_x1)) )
+        right_x1 = lidar[-i-2] * math.cos(math.pi - angle)
+        right_y1 = lidar[-i-2] * math.sin(math.pi - angle)
+        right_x2 = lidar[-i-3] * math.cos(math.pi - 2*angle)
+        right_y2 = lidar[-i-3] * math.sin(math.pi - 2*angle)
+        right_slopes.append( math.atan2((right_y2-right_y1) , (right_x2-right_x1)) )
+    return average(left_slopes), average(right_slopes)
+
+
+def _chooseAvoidAngle(lidar, dist, thresh, reading_number):
+    # make a list of tuples representing start and end indices of lidar segments
+    segments = []
+    start = 10
+    end = 10
+    _sum = 0
+    cutoff = reading_number*25  # limit to 110 deg
+    for i in range(cutoff,len(lidar)-cutoff):
+        if(lidar[i] > dist+thresh):
+            end = i+1
+            _sum += lidar[i] #* (len(lidar)//2 - i)
+        elif(start != end):
+            segments.append( (start, end, _sum) )
+            start = end = i+1
+            _sum = 0
+        else:
+            start = end = i+1
+    segments.append( (start, end, _sum) )
+    # select segment of greatest area
+    _max = 0
+    index = 0
+    for i in range(len(segments)):
+        if(segments[i][2] > _max):
+            _max = segments[i][2]
+            index = i
+    # get angle from the middle of the best segment
+    size = segments[index][1]-segments[index][0]
+    best_index = segments[index][0] + size//2
+    angle = math.pi / len(lidar)
+    ans = best_index * angle - math.pi/2
+    return ans
+
+def cycle(lidar, car, velocity, motorSpeed, turnAngle, collisionAvoid, obsDist, safetyMode, motorKill=False):
+    # checkEmergency followed by avoidCollision or autoProgram of the driver in auto state, returns
+    # (velocity asked of changeMotorSpeed, turnAngle, collisionAvoid, obsDist, safetyMode, wall)
+    # motorKill - the motors were killed by eBreak, within the half second Car.changeMotorSpeed brakes
+    front_dist = _getFrontDist(lidar, car.carLength)
+    if(velocity**2/front_dist > 0.07): # 0.03 is probably a good approx based readings without motors running
+        # check slopes of obstacle in front of us
+        front_angle = _getFrontAngle(lidar, car.carLength)
+        if(front_angle < 2.0 and front_angle > 1.2): # these values are the range of slopes perpendicular to the car
+            safetyMode = True
+    if(front_dist < 0.5): #always go to safety mode
+        safetyMode = True
+
+    # safetyProgram
+    motorKill = motorKill or safetyMode
+
+    def changeMotorSpeed(val):
+        # the motorSpeed Car.changeMotorSpeed leaves, before the half second of braking is over
+        velocity = val
+        if(velocity > car.speed_factor):
+            velocity = car.speed_factor
+        if(motorKill):
+            if(motorSpeed != 0):
+                velocity = -1
+            else:
+                velocity = 0
+        return 100*velocity/2.0
+
+    def detectObstacle(front_dist, motorSpeed):
+        lookaheadDistance = car.carLength * 5 * motorSpeed/10
+        lookaheadDistance = max(lookaheadDistance, 2.5) # set lower bound to lookaheadDistance to 2
+        return front_dist < lookaheadDistance
+
+    wall = 0
+    if collisionAvoid:
+        # avoidCollision
+        velocity = 0.2
+        motorSpeed = changeMotorSpeed(0.2)
+        new_angle = _chooseAvoidAngle(lidar, obsDist, 0.1, car.reading_number)
+        collisionAvoid = detectObstacle(front_dist, motorSpeed)
+    else:
+        collisionAvoid = detectObstacle(front_dist, motorSpeed)
+        if front_dist < car.slowdown_distance * car.speed_factor:
+            velocity = 0.2  # if obstacle up ahead but not imminent, lower speed to minimum
+        elif front_dist < car.slowdown_distance * car.speed_factor * 1.4:
+            velocity = 0.0
+        else:
+            velocity = (front_dist - 2.5) / 7.5 * (car.speed_factor - 0.2) + 0.2
+        left_slope, right_slope = wall_slopes(lidar)
+        if(abs(left_slope - right_slope) < math.pi/10):
+            new_angle = (left_slope + right_slope - math.pi)/2
+        else:
+            new_angle = 0
+        left, right = side_averages(lidar, car.reading_number)
+        if(left < car.carLength):
+            new_angle, wall = new_angle + math.pi/12, 1
+        elif(right < car.carLength):
+            new_angle, wall = new_angle - math.pi/12, 2
+    if collisionAvoid:
+        obsDist = front_dist
+
+    diff = abs(new_angle - turnAngle)
+    if(new_angle > turnAngle): # right
+        turnAngle = turnAngle + 0.2*diff
+    elif(new_angle < turnAngle): # left
+        turnAngle = turnAngle - 0.2*diff
+    turnAngle = min(max(turnAngle, -math.pi/4), math.pi/4)
+    return velocity, turnAngle, collisionAvoid, obsDist, safetyMode, wall
+
+
+def make_scans(count, beams=181):
+    # hallway like scans, walls at the ends, a random obstacle ahead in half of them
+    rng = numpy.random.RandomState(0)
+    scans = rng.uniform(2.0, 10.0, (count, beams)).astype(numpy.float32)
+    scans[:, :8] = rng.uniform(0.2, 1.5, (count, 1))
+    scans[:, -8:] = rng.uniform(0.2, 1.5, (count, 1))
+    for row in range(0, count, 2):
+        start = rng.randint(40, 130)
+        scans[row, start:start + rng.randint(2, 15)] = rng.uniform(0.1, 3.0)
+    return scans
+
+
+class TestDriverHelpers(unittest.TestCase):
+    carLength = 0.5
+    places = 4 # the helpers work on the float32 readings, the loops on Python floats
+
+    def setUp(self):
+        self.scans = make_scans(300)
+        self.beams = driver_core.BeamTables(self.scans.shape[1])
+
+    def test_front_dist_and_angle(self):
+        dist = driver_core.front_dist(self.scans, self.beams, self.carLength)
+        angle = driver_core.front_angle(self.scans, self.beams, self.carLength)
+        for row, scan in enumerate(self.scans):
+            lidar = [float(value) for value in scan]
+            self.assertEqual(_getFrontDist(lidar, self.carLength), dist[row])
+            self.assertAlmostEqual(_getFrontAngle(lidar, self.carLength), angle[row], places=self.places)
+
+    def test_front_dist_off_centre(self):
+        for angle in (-0.5, 0.3):
+            dist = driver_core.front_dist(self.scans, self.beams, self.carLength, angle)
+            for row, scan in enumerate(self.scans[:20]):
+                self.assertEqual(_getFrontDist([float(value) for value in scan], self.carLength, angle), dist[row])
+
+    def test_side_averages_and_wall_slopes(self):
+        left, right = driver_core.side_averages(self.scans, 1)
+        left_slope, right_slope = driver_core.wall_slopes(self.scans, self.beams)
+        for row, scan in enumerate(self.scans):
+            lidar = [float(value) for value in scan]
+            old_left, old_right = side_averages(lidar, 1)
+            self.assertAlmostEqual(old_left, left[row], places=self.places)
+            self.assertAlmostEqual(old_right, right[row], places=self.places)
+            old_left, old_right = wall_slopes(lidar)
+            self.assertAlmostEqual(old_left, left_slope[row], places=self.places)
+            self.assertAlmostEqual(old_right, right_slope[row], places=self.places)
+
+
+class Car(object):
+    # the Car attributes driver_core reads
+    carLength = 0.5
+    carWidth = 0.3
+    reading_number = 1
+    slowdown_distance = 5
+    speed_factor = 0.4
+
+
+class PointCar(Car):
+    # obstacles are not grown for a car without width, so decide picks the gaps of _chooseAvoidAngle
+    carWidth = 0.0
+
+
+class TestDecide(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(1)
+        self.scans = make_scans(400)
+        # the gaps of _chooseAvoidAngle open at the cutoff start at beam 10, see test_gap_finder
+        self.scans[:, 25] = 0.3
+        count = len(self.scans)
+        self.velocity = rng.uniform(0.0, 0.4, count)
+        self.motorSpeed = 100*self.velocity/2.0
+        self.turnAngle = rng.uniform(-0.5, 0.5, count)
+        self.collisionAvoid = rng.rand(count) < 0.5
+        self.obsDist = rng.uniform(0.5, 3.0, count)
+        self.safetyMode = rng.rand(count) < 0.1
+        self.car = PointCar()
+        self.features = driver_core.ScanFeatures(self.scans, driver_core.BeamTables(self.scans.shape[1]), self.car)
+
+    def decide_one(self, scan, car, *state):
+        features = driver_core.ScanFeatures(numpy.array([scan], dtype=numpy.float32),
+                                            driver_core.BeamTables(len(scan)), car)
+        return driver_core.decide(features, car, *state)
+
+    def test_matches_one_driver_cycle_per_scan(self):
+        decision = driver_core.decide(self.features, self.car, self.velocity, self.motorSpeed, self.turnAngle,
+                                      self.collisionAvoid, self.obsDist, self.safetyMode)
+        for row, scan in enumerate(self.scans):
+            old = cycle([float(value) for value in scan], self.car, self.velocity[row], self.motorSpeed[row],
+                        self.turnAngle[row], self.collisionAvoid[row], self.obsDist[row], self.safetyMode[row])
+            velocity, turnAngle, collisionAvoid, obsDist, safetyMode, wall = old
+            self.assertAlmostEqual(velocity, decision.velocity[row], places=6)
+            self.assertAlmostEqual(turnAngle, decision.angle[row], places=5)
+            self.assertEqual(collisionAvoid, decision.collisionAvoid[row])
+            self.assertEqual(driver_core.STATES[int(collisionAvoid)], driver_core.STATES[decision.state[row]])
+            self.assertAlmostEqual(obsDist, decision.obsDist[row], places=6)
+            self.assertEqual(safetyMode, decision.safetyMode[row])
+            self.assertEqual(wall, decision.wall[row])
+        # both modes and all walls were decided on
+        self.assertEqual({0, 1, 2}, set(decision.wall[~self.collisionAvoid]))
+
+    def test_killed_motors_look_ahead_like_the_old_cycle(self):
+        # for a car up to 0.5 m long the lookahead is 2.5 m at the avoiding speed and when braking
+        decision = driver_core.decide(self.features, self.car, self.velocity, self.motorSpeed, self.turnAngle,
+                                      True, self.obsDist, self.safetyMode)
+        for row, scan in enumerate(self.scans[:100]):
+            old = cycle([float(value) for value in scan], self.car, self.velocity[row], self.motorSpeed[row],
+                        self.turnAngle[row], True, self.obsDist[row], self.safetyMode[row], motorKill=True)
+            self.assertEqual(old[2], decision.collisionAvoid[row])
+
+    def test_lookahead_assumes_the_motors_run(self):
+        # a longer car looks further ahead at the avoiding speed, the old cycle only 2.5 m once the
+        # motors were killed, as changeMotorSpeed had already set the braking speed
+        car = Car()
+        car.carLength = 1.0
+        scan = [4.0] * 181
+        decision = self.decide_one(scan, car, 0.2, 10.0, 0.0, True, 2.0, False)
+        self.assertTrue(decision.collisionAvoid[0])
+        self.assertTrue(cycle(scan, car, 0.2, 10.0, 0.0, True, 2.0, False)[2])
+        self.assertFalse(cycle(scan, car, 0.2, 10.0, 0.0, True, 2.0, False, motorKill=True)[2])
+
+    def test_obstacles_are_grown_by_half_the_car_width(self):
+        # the narrow deep gap the old loop picked is closed for a 0.3 m wide car, it steers for the wide one
+        scan = [1.0] * 181
+        scan[60:66] = [9.0] * 6
+        scan[100:130] = [1.5] * 30
+        beam_angle = math.pi / 181
+        narrow = (60 + 6//2) * beam_angle - math.pi/2
+        old = cycle(scan, self.car, 0.2, 10.0, 0.0, True, 1.0, False)
+        self.assertAlmostEqual(0.2*narrow, old[1])
+        self.assertAlmostEqual(0.2*narrow, self.decide_one(scan, PointCar(), 0.2, 10.0, 0.0, True, 1.0, False).angle[0])
+        decision = self.decide_one(scan, Car(), 0.2, 10.0, 0.0, True, 1.0, False)
+        grow = int(math.ceil(math.asin(0.15) / beam_angle))
+        wide = (100 + grow + (30 - 2*grow)//2) * beam_angle - math.pi/2
+        self.assertAlmostEqual(0.2*wide, decision.angle[0])
+
+    def test_no_gap_keeps_the_angle(self):
+        scans = numpy.full((1, 181), 0.8, dtype=numpy.float32)
+        features = driver_core.ScanFeatures(scans, driver_core.BeamTables(181), self.car)
+        decision = driver_core.decide(features, self.car, 0.2, 10.0, 0.3, True, 0.8, False)
+        self.assertEqual(0.3, decision.angle[0])
+        self.assertEqual(0.2, decision.velocity[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
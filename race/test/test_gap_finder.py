@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# gap_finder must pick the gap _chooseAvoidAngle of the driver picked, copied below, apart from the
+# start = end = 10 it began with and from scans without any gap
+
+import math
+import os
+import sys
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import gap_finder
+
+
+def _chooseAvoidAngle(lidar, dist, thresh, reading_number=1, first=10):
+    # first - where the first segment starts, 10 in the driver
+    # make a list of tuples representing start and end indices of lidar segments
+    segments = []
+    start = first
+    end = first
+    _sum = 0
+    cutoff = reading_number*25  # limit to 110 deg
+    for i in range(cutoff,len(lidar)-cutoff):
+        if(lidar[i] > dist+thresh):
+            end = i+1
+            _sum += lidar[i] #* (len(lidar)//2 - i)
+        elif(start != end):
+            segments.append( (start, end, _sum) )
+            start = end = i+1
+            _sum = 0
+        else:
+            start = end = i+1
+    segments.append( (start, end, _sum) )
+    # select segment of greatest area
+    _max = 0
+    index = 0
+    for i in range(len(segments)):
+        if(segments[i][2] > _max):
+            _max = segments[i][2]
+            index = i
+    # get angle from the middle of the best segment
+    size = segments[index][1]-segments[index][0]
+    best_index = segments[index][0] + size//2
+    angle = math.pi / len(lidar)
+    ans = best_index * angle - math.pi/2
+    return ans
+
+def choose_angle(ranges, threshold, cutoff=25):
+    beam_angle = math.pi / ranges.shape[-1]
+    start, end = gap_finder.best_gaps(ranges, threshold, beam_angle, cutoff=cutoff)
+    return gap_finder.gap_angles(start, end, beam_angle)
+
+
+class TestGapFinder(unittest.TestCase):
+
+    def setUp(self):
+        # obstacles at 1 m with free stretches of random widths, the first 30 beams blocked
+        rng = numpy.random.RandomState(0)
+        self.scans = numpy.ones((200, 181), dtype=numpy.float32)
+        for row in self.scans:
+            free = rng.rand(181) < 0.4
+            free[:30] = False
+            row[free] = rng.uniform(1.5, 10.0, free.sum())
+
+    def test_matches_old_loop(self):
+        angles = choose_angle(self.scans, 1.1)
+        for row, scan in enumerate(self.scans):
+            lidar = [float(value) for value in scan]
+            self.assertAlmostEqual(_chooseAvoidAngle(lidar, 1.0, 0.1), angles[row])
+
+    def test_first_gap_starts_at_the_cutoff(self):
+        # a gap open from the cutoff on, the old loop measured it from beam 10
+        scan = numpy.ones(181, dtype=numpy.float32)
+        scan[25:60] = 5.0
+        lidar = [float(value) for value in scan]
+        beam_angle = math.pi / 181
+        self.assertAlmostEqual((25 + 35//2) * beam_angle - math.pi/2, choose_angle(scan, 1.1)[0])
+        self.assertAlmostEqual(_chooseAvoidAngle(lidar, 1.0, 0.1, first=25), choose_angle(scan, 1.1)[0])
+        self.assertNotAlmostEqual(_chooseAvoidAngle(lidar, 1.0, 0.1), choose_angle(scan, 1.1)[0])
+
+    def test_no_gap(self):
+        scan = numpy.ones((1, 181))
+        start, end = gap_finder.best_gaps(scan, 1.1, math.pi / 181, cutoff=25)
+        self.assertEqual((-1, -1), (start[0], end[0]))
+        self.assertTrue(numpy.isnan(choose_angle(scan, 1.1)[0]))
+        # free beams only inside the cutoff are no gap either
+        scan[0, :20] = 5.0
+        self.assertTrue(numpy.isnan(choose_angle(scan, 1.1)[0]))
+
+    def test_batch_matches_single_scans(self):
+        angles = choose_angle(self.scans, 1.1)
+        for row in range(0, len(self.scans), 20):
+            self.assertEqual(angles[row], choose_angle(self.scans[row], 1.1)[0])
+
+    def test_inflation_closes_narrow_gaps(self):
+        # a 5 beam gap between obstacles at 1 m is about 5 degrees, 9 cm at that range
+        scan = numpy.ones((1, 181))
+        scan[0, 80:85] = 5.0
+        beam_angle = math.pi / 181
+        self.assertEqual((80, 85), tuple(int(value[0]) for value in gap_finder.best_gaps(scan, 1.1, beam_angle)))
+        self.assertEqual(-1, gap_finder.best_gaps(scan, 1.1, beam_angle, half_width=0.25)[0][0])
+
+    def test_nan_and_inf_readings(self):
+        # NaN is blocked without growing, inf is free
+        scan = numpy.ones((1, 181))
+        scan[0, 60:120] = 5.0
+        scan[0, 90] = numpy.nan
+        scan[0, 100] = numpy.inf
+        beam_angle = math.pi / 181
+        start, end = gap_finder.find_gaps(scan, 1.1, beam_angle, half_width=0.15, cutoff=25)[1:]
+        grow = int(math.ceil(math.asin(0.15) / beam_angle)) # beams an obstacle at 1 m is grown by
+        self.assertEqual([(60 + grow, 90), (91, 120 - grow)], list(zip(start, end)))
+        decision = choose_angle(scan, 1.1)
+        self.assertTrue(numpy.isfinite(decision[0]))
+
+    def test_scorings(self):
+        scan = numpy.ones((1, 181))
+        scan[0, 30:50] = 2.0 # widest
+        scan[0, 100:105] = 9.0 # deepest, and largest sum
+        scan[0, 140:145] = 3.0
+        beam_angle = math.pi / 181
+        pick = lambda scoring, heading=None: int(gap_finder.best_gaps(scan, 1.1, beam_angle, scoring=scoring,
+                                                                        heading=heading)[0][0])
+        self.assertEqual(100, pick("sum"))
+        self.assertEqual(30, pick("widest"))
+        self.assertEqual(100, pick("deepest"))
+        self.assertEqual(140, pick("heading", 150))
+        self.assertRaises(ValueError, pick, "longest")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# the latency percentiles the nodes report on /diagnostics
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import ros_stubs
+ros_stubs.install()
+import latency_stats
+
+
+class TestLatencyStats(unittest.TestCase):
+
+    def setUp(self):
+        self.publishers = ros_stubs.Publishers()
+        self.reporter = latency_stats.LatencyReporter('driver', publisher=self.publishers)
+
+    def report(self):
+        self.reporter.publish()
+        return dict((status.name, dict((value.key, value.value) for value in status.values))
+                    for status in self.publishers['/diagnostics'].sent[-1].status)
+
+    def test_percentiles_of_known_samples(self):
+        histogram = self.reporter.stage('scan_to_drive_parameters')
+        for ms in range(100, 0, -1):
+            histogram.record(ms / 1000.0)
+        self.assertAlmostEqual(0.050, histogram.percentile(50))
+        self.assertEqual({'p50_ms': '50.00', 'p95_ms': '95.00', 'p99_ms': '99.00', 'max_ms': '100.00', 'count': '100'},
+                         self.report()['driver: scan_to_drive_parameters latency'])
+
+    def test_slow_samples_report_the_maximum(self):
+        histogram = self.reporter.stage('slow')
+        for i in range(98):
+            histogram.record(0.001)
+        histogram.record(0.7) # past max_latency, counted in the last bin
+        histogram.record(0.8)
+        self.assertEqual({'p50_ms': '1.00', 'p95_ms': '1.00', 'p99_ms': '800.00', 'max_ms': '800.00', 'count': '100'},
+                         self.report()['driver: slow latency'])
+
+    def test_every_report_covers_its_own_period(self):
+        histogram = self.reporter.stage('scan_to_drive_parameters')
+        histogram.record(0.2)
+        self.assertEqual('200.00', self.report()['driver: scan_to_drive_parameters latency']['p50_ms'])
+        self.assertEqual({'p50_ms': 'nan', 'p95_ms': 'nan', 'p99_ms': 'nan', 'max_ms': '0.00', 'count': '0'},
+                         self.report()['driver: scan_to_drive_parameters latency'])
+        histogram.record(0.01)
+        self.assertEqual('10.00', self.report()['driver: scan_to_drive_parameters latency']['p50_ms'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# ScanResampler must fill Car.lidar the way the update_lidar loop of the driver did, and min pooling
+# must keep the closest beam within half a bin of every bin's angle
+
+import math
+import os
+import sys
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lidar_resampler import ScanResampler
+
+
+def update_lidar(lidar, ranges, reading_number=1):
+    # the driver's update_lidar before ScanResampler, for the 1081 beam / 270 degree lidar
+    for i in range(180,len(ranges)-180):
+        # these are values behind the LIDAR, we will discard them
+        mapped_index = int(-(180.0*reading_number/720)*(i-900))
+        lidar[mapped_index] = ranges[i]
+
+def min_pool(lidar, scan):
+    # the closest beam with an angle in (angle_k - bin_angle/2, angle_k + bin_angle/2] of every bin k
+    bin_angle = math.pi / (len(lidar) - 1)
+    half = bin_angle/2 / scan.angle_increment
+    for k in range(len(lidar)):
+        position = (math.pi/2 - k*bin_angle - scan.angle_min) / scan.angle_increment # in beams
+        lidar[k] = min(scan.ranges[i] for i in range(len(scan.ranges))
+                       if round(position - half, 6) < i <= round(position + half, 6))
+
+
+class Scan(object):
+
+    def __init__(self, ranges, angle_min=-3*math.pi/4, angle_increment=math.radians(0.25)):
+        self.angle_min = angle_min
+        self.angle_increment = angle_increment
+        self.ranges = ranges
+
+
+class TestScanResampler(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.scans = [Scan(rng.uniform(0.1, 10.0, 1081).astype(numpy.float32)) for _ in range(20)]
+
+    def test_nearest_matches_old_loop(self):
+        resampler = ScanResampler(181)
+        for scan in self.scans:
+            old = numpy.full(181, 10.0, dtype=numpy.float32)
+            update_lidar(old, scan.ranges)
+            new = resampler.fill(scan, numpy.zeros(181, dtype=numpy.float32))
+            self.assertTrue(numpy.array_equal(old, new))
+        self.assertEqual(1, resampler.rebuilds)
+
+    def test_min_pools_half_a_bin_each_side(self):
+        resampler = ScanResampler(181, "min")
+        for scan in self.scans[:4]:
+            old = numpy.zeros(181, dtype=numpy.float32)
+            min_pool(old, scan)
+            new = resampler.fill(scan, numpy.zeros(181, dtype=numpy.float32))
+            self.assertTrue(numpy.array_equal(old, new))
+
+    def test_thin_obstacle_lands_in_the_bin_it_is_closest_to(self):
+        # bin 90 looks straight ahead, beam 540; beams 539 and 541 are a quarter of a bin to either side
+        for beam in (539, 541, 542):
+            ranges = numpy.full(1081, 8.0, dtype=numpy.float32)
+            ranges[beam] = 1.0
+            lidar = ScanResampler(181, "min").fill(Scan(ranges), numpy.zeros(181, dtype=numpy.float32))
+            self.assertEqual([90], list(numpy.nonzero(lidar == 1.0)[0]))
+
+    def test_geometry_change_rebuilds_the_map(self):
+        resampler = ScanResampler(181, "min")
+        resampler.fill(self.scans[0], numpy.zeros(181))
+        resampler.fill(Scan(numpy.ones(721), -math.pi/2, math.radians(0.25)), numpy.zeros(181))
+        self.assertEqual(2, resampler.rebuilds)
+        self.assertRaises(ValueError, ScanResampler, 181, "max")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# messages between the components of node_container are handed over by reference
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import ros_stubs
+ros_stubs.install()
+from std_msgs.msg import String
+import node_container
+
+TIMEOUT = 5.0
+
+
+class Received(object):
+    # callback collecting the messages delivered to a subscriber, block holds up its first call
+
+    def __init__(self, count, block=False):
+        self.messages = []
+        self.count = count
+        self.done = threading.Event()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self, msg, *args):
+        self.started.set()
+        self.release.wait(TIMEOUT)
+        self.messages.append((msg,) + args)
+        if len(self.messages) == self.count:
+            self.done.set()
+
+
+class TestIntraBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = node_container.IntraBus(['features'])
+        self.rospy = node_container.ContainerRospy(self.bus, '/race_container')
+
+    def test_subscribers_receive_the_published_object(self):
+        first, second = Received(1), Received(1)
+        self.rospy.Subscriber('features', String, first)
+        self.rospy.Subscriber('/features', String, second, callback_args='second')
+        pub = self.rospy.Publisher('features', String, queue_size=1)
+        msg = String(data='hello')
+        pub.publish(msg)
+        self.assertTrue(first.done.wait(TIMEOUT) and second.done.wait(TIMEOUT))
+        self.assertIs(msg, first.messages[0][0])
+        self.assertEqual([(msg, 'second')], second.messages)
+        self.assertEqual(1, len(pub.real.sent)) # and over ROS for nodes outside the container
+
+    def test_other_topics_are_not_on_the_bus(self):
+        pub = self.rospy.Publisher('drive_parameters', String, queue_size=1)
+        self.assertIsNone(pub.bus)
+        pub.publish(String(data='x'))
+        self.assertEqual([], self.bus.subscriptions.get('/drive_parameters', []))
+
+    def test_slow_subscriber_keeps_the_newest_messages(self):
+        received = Received(1 + 3, block=True)
+        self.rospy.Subscriber('features', String, received, queue_size=3)
+        pub = self.rospy.Publisher('features', String, queue_size=1)
+        pub.publish(String(data=0))
+        self.assertTrue(received.started.wait(TIMEOUT)) # 0 is taken, the callback is held up
+        for number in range(1, 8):
+            pub.publish(String(data=number))
+        received.release.set()
+        self.assertTrue(received.done.wait(TIMEOUT))
+        self.assertEqual([0, 5, 6, 7], [msg.data for msg, in received.messages])
+
+    def test_unregistered_subscriber_gets_nothing(self):
+        received = Received(1)
+        subscription = self.rospy.Subscriber('features', String, received)
+        self.assertEqual(1, subscription.get_num_connections())
+        subscription.unregister()
+        self.assertEqual(0, subscription.get_num_connections())
+        self.rospy.Publisher('features', String, queue_size=1).publish(String(data='late'))
+        self.assertFalse(received.done.wait(0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# scan_feature_server's front fractions must answer every threshold the wall following nodes ask for
+
+import math
+import os
+import sys
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import ros_stubs
+ros_stubs.install()
+from sensor_msgs.msg import LaserScan
+import constants
+import scan_feature_server
+import scan_utils
+
+
+def make_scans(count, beams=1081):
+    # open hallway out to the lidar's range with clutter at random distances ahead
+    rng = numpy.random.RandomState(0)
+    scans = []
+    for seq in range(count):
+        ranges = rng.uniform(0.5, 12.0, beams)
+        ranges[rng.rand(beams) < 0.1] = numpy.nan
+        scan = LaserScan(angle_min=-3*math.pi/4, angle_increment=math.radians(0.25), range_min=0.06,
+                         range_max=30.0, ranges=tuple(ranges))
+        scan.header.seq = seq
+        scans.append(scan)
+    return scans
+
+
+class TestScanFeatureServer(unittest.TestCase):
+
+    def setUp(self):
+        self.publishers = ros_stubs.Publishers()
+        self.server = scan_feature_server.ScanFeatureServer(publisher=self.publishers, subscribe=False)
+
+    def features(self, scan):
+        self.server.callback(scan)
+        return self.publishers['scan_features'].sent[-1]
+
+    def test_grid_reaches_the_longest_stopping_distance(self):
+        stops = [speed["STOPPING_DISTANCE"] for pid in (constants.PID_CONST, constants.PID_CONST_FAST)
+                 for speed in pid.values()]
+        thresholds = self.server.front_thresholds
+        self.assertEqual(max(stops), thresholds[-1])
+        self.assertLessEqual(thresholds[0], 0.25) # WIDTH/2 of goFastOrGoHome
+        for distance in stops + [0.5, 1.5, 3.0]:
+            self.assertIn(distance, thresholds)
+        self.assertEqual(sorted(thresholds), thresholds)
+
+    def test_stopping_distances_are_exact(self):
+        for scan in make_scans(20):
+            features = self.features(scan)
+            for distance in scan_feature_server.STOPPING_DISTANCES:
+                self.assertAlmostEqual(scan_utils.front_fraction(scan, distance),
+                                       scan_utils.front_fraction(features, distance))
+
+
+if __name__ == '__main__':
+    unittest.main()
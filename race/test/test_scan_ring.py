@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# scans written to a ScanRing must reach readers whole, and a reader must notice when the writer reused the
+# slot of a scan it still holds
+
+import math
+import os
+import sys
+import time
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import scan_ring
+
+NAME = "race_scan_test_%d" % os.getpid()
+
+
+def write(ring, seq, beams=1081):
+    return ring.write(seq, 100 + seq, 5000, -3*math.pi/4, math.radians(0.25), 0.06, 10.0,
+                      numpy.full(beams, float(seq), dtype=numpy.float32))
+
+
+class TestScanRing(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = scan_ring.ScanRing(NAME, 1081, slots=4, create=True)
+        self.reader = scan_ring.ScanRing(NAME)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_latest_is_the_newest_scan(self):
+        self.assertIsNone(self.reader.latest())
+        for seq in range(6):
+            write(self.writer, seq)
+        scan = self.reader.latest()
+        self.assertEqual(5, scan.header.seq)
+        self.assertAlmostEqual(105.000005, scan.header.stamp)
+        self.assertEqual(-3*math.pi/4, scan.angle_min)
+        self.assertTrue(numpy.array_equal(numpy.full(1081, 5.0), scan.ranges))
+        self.assertTrue(scan.intact())
+
+    def test_shorter_scans_keep_their_count(self):
+        write(self.writer, 1, beams=721)
+        self.assertEqual(721, len(self.reader.latest().ranges))
+        self.assertRaises(ValueError, write, self.writer, 2, 1082)
+
+    def test_reused_slot_is_not_intact(self):
+        write(self.writer, 0)
+        scan = self.reader.latest()
+        for seq in range(1, 5):
+            write(self.writer, seq)
+        self.assertFalse(scan.intact())
+
+    def test_copied_scan_outlives_its_slot(self):
+        write(self.writer, 0)
+        scan = self.reader.latest(copy=True)
+        for seq in range(1, 5):
+            write(self.writer, seq)
+        self.assertTrue(scan.intact())
+        self.assertTrue(numpy.array_equal(numpy.zeros(1081), scan.ranges))
+
+    def test_half_written_slot_is_not_handed_out(self):
+        write(self.writer, 0)
+        self.writer.slots[0]["seq"] += 1 # what a reader sees while the writer is in the slot
+        self.assertIsNone(self.reader.latest())
+
+    def test_reader_thread_gets_the_scans(self):
+        scans = []
+        reader = scan_ring.RingReader(NAME, lambda scan: scans.append(scan.header.seq))
+        reader.start()
+        for seq in range(20):
+            write(self.writer, seq)
+            time.sleep(0.01)
+        time.sleep(0.05)
+        reader.unregister()
+        reader.join()
+        self.assertEqual(19, scans[-1])
+        self.assertEqual(sorted(set(scans)), scans)
+        self.assertEqual(20, len(scans) + reader.missed)
+
+    def test_reader_thread_scans_are_copies(self):
+        scans = []
+        reader = scan_ring.RingReader(NAME, scans.append)
+        reader.start()
+        write(self.writer, 0)
+        time.sleep(0.05)
+        for seq in range(1, 5):
+            write(self.writer, seq)
+        time.sleep(0.05)
+        reader.unregister()
+        reader.join()
+        self.assertTrue(all(scan.intact() for scan in scans))
+        self.assertTrue(numpy.array_equal(numpy.zeros(1081), scans[0].ranges))
+
+
+if __name__ == '__main__':
+    unittest.main()
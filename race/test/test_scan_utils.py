@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# scan_utils must return what the getRange and getSomeScans copies of the wall following nodes, and the
+# wall and front cone code around them, returned
+
+import math
+import os
+import sys
+import unittest
+import numpy
+from numpy import isnan
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import scan_utils
+
+
+def getSomeScans(data,theta_start,theta_end):
+    # obstacle_detector and goFastOrGoHome before scan_utils
+    if (theta_start > theta_end):
+        return None
+    theta_0 = data.angle_min
+    theta_delta = data.angle_increment
+
+    start = int((theta_start-theta_0)/theta_delta)
+    end = int((theta_end-theta_0)/theta_delta)
+
+    subset = data.ranges[start:end]
+    MIN = data.range_min
+    return [x for x in subset if (~isnan(x) and x>MIN)] #discards garbage
+
+def getRange(data,theta):
+    # dist_finder, obstacle_detector and goFastOrGoHome before scan_utils
+    theta_0 = data.angle_min
+    theta_delta = data.angle_increment
+
+    idx = int((theta-theta_0)/theta_delta)
+
+    i = 1
+
+    for j in range(len(data.ranges)):
+            # discard any values that are outside valid range
+            if isnan(data.ranges[idx]) or data.ranges[idx] > data.range_max or data.ranges[idx] < data.range_min:
+                    if (i % 2 == 0):
+                            idx = idx + -i
+                    else:
+                            idx = idx + i
+
+                    i = i + 1
+            else:
+                    return data.ranges[idx]
+
+    return None
+
+def detect_collision_parts(data, SIDE, threshold):
+    # the wall angle and front check of obstacle_detector.detect_collision before scan_utils
+    swing = math.radians(50)
+    a = getRange(data,SIDE * (-math.pi/2+swing))
+    b = getRange(data,SIDE * (-math.pi/2))
+    alpha = SIDE * math.atan((a*math.cos(swing)-b)/(a*math.sin(swing)))
+    left_theta = - math.asin(0.15/threshold)
+    distances = getSomeScans(data,left_theta,-left_theta)
+    return alpha, b*math.cos(alpha), numpy.mean([x < threshold for x in distances])
+
+
+class Features(object):
+    # a scan_features message
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class Scan(object):
+    # the parts of a sensor_msgs/LaserScan the nodes read, ranges is a tuple like rospy gives
+
+    def __init__(self, ranges, angle_min=-3*math.pi/4, angle_increment=math.radians(0.25)):
+        self.angle_min = angle_min
+        self.angle_increment = angle_increment
+        self.range_min = 0.06
+        self.range_max = 10.0
+        self.ranges = tuple(float(value) for value in ranges)
+
+
+def make_scans(count, beams=1081, invalid=0.3):
+    # readings with a fraction of NaNs, infs, readings under range_min and over range_max
+    rng = numpy.random.RandomState(0)
+    scans = []
+    for _ in range(count):
+        ranges = rng.uniform(0.0, 12.0, beams)
+        bad = rng.rand(beams) < invalid
+        ranges[bad] = rng.choice([numpy.nan, numpy.inf, 0.01, 11.0], bad.sum())
+        scans.append(Scan(ranges))
+    return scans
+
+
+class TestScanUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.scans = make_scans(20)
+        self.angles = numpy.linspace(-math.pi/2, math.pi/2, 97)
+
+    def test_get_range_matches_old_walk(self):
+        for scan in self.scans:
+            for theta in self.angles:
+                self.assertEqual(getRange(scan, theta), scan_utils.get_range(scan, theta))
+
+    def test_get_range_prefers_higher_index_on_ties(self):
+        ranges = numpy.full(1081, numpy.nan)
+        ranges[539] = 1.0
+        ranges[541] = 2.0
+        scan = Scan(ranges)
+        theta = 540.5 * scan.angle_increment + scan.angle_min # index 540
+        self.assertEqual(2.0, getRange(scan, theta))
+        self.assertEqual(2.0, scan_utils.get_range(scan, theta))
+
+    def test_get_range_without_valid_readings(self):
+        scan = Scan(numpy.full(1081, numpy.nan))
+        self.assertIsNone(getRange(scan, 0.0))
+        self.assertIsNone(scan_utils.get_range(scan, 0.0))
+
+    def test_get_some_scans_matches_old_filter(self):
+        for scan in self.scans:
+            for start in self.angles[::4]:
+                for width in (0.0, 0.01, 0.1, 0.5):
+                    old = getSomeScans(scan, start, start + width)
+                    new = scan_utils.get_some_scans(scan, start, start + width)
+                    self.assertEqual(old, list(new))
+        self.assertIsNone(scan_utils.get_some_scans(self.scans[0], 0.1, -0.1))
+
+    def test_geometry_is_rebuilt_when_the_layout_changes(self):
+        first = scan_utils.valid_scan(self.scans[0]).geometry
+        self.assertIs(first, scan_utils.valid_scan(self.scans[1]).geometry)
+        other = Scan(numpy.ones(721), angle_min=-math.pi/2)
+        self.assertIsNot(first, scan_utils.valid_scan(other).geometry)
+        self.assertEqual(getRange(other, 0.3), scan_utils.get_range(other, 0.3))
+
+    def test_wall_and_front_fraction_match_the_nodes(self):
+        for scan in self.scans:
+            for side in scan_utils.SIDES:
+                for threshold in (0.5, 1.5, 3.0, 5.5):
+                    alpha, dist, fraction = detect_collision_parts(scan, side, threshold)
+                    self.assertEqual((alpha, dist), scan_utils.wall(scan, side))
+                    self.assertEqual(fraction, scan_utils.front_fraction(scan, threshold))
+
+    def test_features_message_gives_the_same_answers(self):
+        scan = self.scans[0]
+        thresholds = numpy.arange(0.5, 6.01, 0.25)
+        features = Features(left_alpha=0.1, left_dist=1.0, right_alpha=-0.2, right_dist=2.0,
+                            front_thresholds=list(thresholds),
+                            front_fraction=[scan_utils.front_fraction(scan, value) for value in thresholds])
+        self.assertEqual((0.1, 1.0), scan_utils.wall(features, -1))
+        self.assertEqual((-0.2, 2.0), scan_utils.wall(features, 1))
+        self.assertAlmostEqual(scan_utils.front_fraction(scan, 1.5), scan_utils.front_fraction(features, 1.5))
+
+    def test_features_refuse_thresholds_off_their_grid(self):
+        scan = self.scans[0]
+        thresholds = numpy.arange(0.25, 6.01, 0.25)
+        features = Features(front_thresholds=list(thresholds),
+                            front_fraction=[scan_utils.front_fraction(scan, value) for value in thresholds])
+        # the smallest threshold goFastOrGoHome asks for, WIDTH/2 with the wall square to the car
+        self.assertEqual(scan_utils.front_fraction(scan, 0.25), scan_utils.front_fraction(features, 0.25))
+        self.assertRaises(ValueError, scan_utils.front_fraction, features, 0.2)
+        self.assertRaises(ValueError, scan_utils.front_fraction, features, 6.5)
+
+    def test_wall_without_valid_readings(self):
+        nan = float("nan")
+        self.assertIsNone(scan_utils.wall(Scan(numpy.full(1081, numpy.nan)), -1))
+        features = Features(left_alpha=nan, left_dist=nan, right_alpha=nan, right_dist=nan,
+                            front_thresholds=[0.5], front_fraction=[nan])
+        self.assertIsNone(scan_utils.wall(features, -1))
+        self.assertIsNone(scan_utils.wall(features, 1))
+
+    def test_nearest_reading(self):
+        ranges = numpy.full(1081, 5.0)
+        ranges[600] = 0.01 # under range_min
+        ranges[700] = 0.5
+        scan = Scan(ranges)
+        dist, bearing = scan_utils.nearest_reading(scan)
+        self.assertEqual(0.5, dist)
+        self.assertAlmostEqual(scan.angle_min + 700*scan.angle_increment, bearing)
+        self.assertTrue(all(numpy.isnan(scan_utils.nearest_reading(Scan(numpy.full(1081, numpy.nan))))))
+
+
+if __name__ == '__main__':
+    unittest.main()